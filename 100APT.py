@@ -2,6 +2,11 @@
 
 import random, sys
 import os
+import atexit, gzip, shutil, tempfile, threading
+import argparse, asyncio, functools, hashlib, heapq, io, json, math, mmap, struct, time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from datetime import datetime
 
 # --- Game Constants ---
@@ -9,9 +14,13 @@ TOTAL_WEEKS = 52  # test; final - 52
 ACTIONS_PER_WEEK = 7 # test; final - 7
 STARTING_CAPITAL = 500
 MAX_FLOORS = 100  # test; final - 100
+SANDBOX_WINDOW = 12  # floors draw() shows for towers taller than MAX_FLOORS
 PREF_BONUS = 0.10
 BANKRUPT_LIMIT = -50
 
+# Recompute Building totals from scratch at every settlement (APT_CHECK_TOTALS=1)
+CHECK_TOTALS = os.environ.get("APT_CHECK_TOTALS") == "1"
+
 APT_TYPES = [
     "Desert Suite","Ocean Chamber","Forest Cabin","Factory Loft","Snowfield Hut","Hogwarts Nook",
     "Cyberpunk Pod","Space Capsule","Underworld Den","Sky Garden","Steampunk Room","Sakura Retreat",
@@ -29,6 +38,9 @@ TYPE_BUILD_COST = {
 # Maintenance base
 TYPE_BASE_MAINT = {k: max(5, v//15 + 4) for k, v in TYPE_BUILD_COST.items()}
 
+# Weekly rent before the preference bonus
+TYPE_BASE_RENT = {k: int(v * 0.6) for k, v in TYPE_BUILD_COST.items()}
+
 TENANTS = [
     ("Alice","Sakura Retreat"),("Bob","Factory Loft"),("Charlie","Grand Library"),("Diana","Zen Chamber"),
     ("Ethan","Music Studio"),
@@ -51,116 +63,909 @@ LABEL = {
     "Jungle Bungalow":"JNG","Aquarium Dome":"AQM","Grand Library":"LIB","Music Studio":"MUS","Gamer's Den":"GAM"
 }
 
+# Small-int theme ids (index into APT_TYPES); -1 = no preference
+TYPE_ID = {t: i for i, t in enumerate(APT_TYPES)}
+TENANT_ID = {name: i for i, (name, _) in enumerate(TENANTS)}
+
+# How many TENANTS prefer each theme; auto-lease keeps popular themes free
+PREF_DEMAND = {t: sum(1 for _, p in TENANTS if p == t) for t in APT_TYPES}
+
+class Rules:
+    '''
+    The balance constants as one object, so a game can run under other
+    values (sweep, --rules). Building, play() and the simulated strategies
+    read them from b.rules; the defaults are the constants above.
+    '''
+    FIELDS = ("starting_capital", "pref_bonus", "actions_per_week", "max_floors", "cost_scale",
+              "build_cost", "rent_rate", "maint_min", "maint_div", "maint_add", "height_rate",
+              "ground_maint")
+
+    def __init__(self, starting_capital=STARTING_CAPITAL, pref_bonus=PREF_BONUS,
+                 actions_per_week=ACTIONS_PER_WEEK, max_floors=MAX_FLOORS, cost_scale=1.0,
+                 build_cost=None, rent_rate=0.6, maint_min=5, maint_div=15, maint_add=4,
+                 height_rate=1.5, ground_maint=20):
+        self.starting_capital = starting_capital
+        self.pref_bonus = pref_bonus
+        self.actions_per_week = actions_per_week
+        self.max_floors = max_floors
+        self.cost_scale = cost_scale
+        self.cost_overrides = dict(build_cost or {})  # theme -> build cost, before cost_scale
+        self.rent_rate = rent_rate
+        self.maint_min = maint_min
+        self.maint_div = maint_div
+        self.maint_add = maint_add
+        self.height_rate = height_rate
+        self.ground_maint = ground_maint  # plus 1 per floor, every week
+
+        # derived per-theme tables (TYPE_BUILD_COST / TYPE_BASE_RENT / TYPE_BASE_MAINT)
+        self.build_cost = dict(TYPE_BUILD_COST, **self.cost_overrides)
+        if cost_scale != 1.0:
+            self.build_cost = {k: round(v * cost_scale) for k, v in self.build_cost.items()}
+        self.base_rent = {k: int(v * rent_rate) for k, v in self.build_cost.items()}
+        self.base_maint = {k: max(maint_min, v // maint_div + maint_add) for k, v in self.build_cost.items()}
+        self.min_cost = min(self.build_cost.values())
+
+    def floor_maintenance(self, apt_type, floor):
+        return self.base_maint[apt_type] + int(self.height_rate * floor)
+
+    def to_dict(self):
+        d = {k: getattr(self, k) for k in self.FIELDS if k != "build_cost"}
+        d["build_cost"] = dict(self.cost_overrides)
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        # values typed as in SWEEP_PARAMS (build costs are ints); 20.0 is taken for 20
+        unknown = set(d) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"unknown rules: {', '.join(sorted(unknown))}")
+        d = dict(d)
+        for name, value in d.items():
+            if name == "build_cost":
+                d[name] = {t: cls._number(f"build_cost[{t}]", v, int) for t, v in (value or {}).items()}
+            else:
+                d[name] = cls._number(name, value, SWEEP_PARAMS[name])
+        return cls(**d)
+
+    @staticmethod
+    def _number(name, value, kind):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"rule {name} must be a number, got {value!r}")
+        if kind is int and value != int(value):
+            raise ValueError(f"rule {name} must be a whole number, got {value!r}")
+        return kind(value)
+
+    def replace(self, **changes):
+        return Rules.from_dict(dict(self.to_dict(), **changes))
+
+    def is_default(self):
+        return self.to_dict() == DEFAULT_RULES.to_dict()
+
+DEFAULT_RULES = Rules()
+
+# --- Game log ---
+LOG_PATH = "game_log.txt"
+LOG_MAX_BYTES = 8 * 1024 * 1024  # rotate game_log.txt past this size
+LOG_BACKUPS = 5                  # game_log.txt.1.gz ... game_log.txt.5.gz
+
+class LogSink:
+    '''
+    Collects game log text in memory and appends it to the log file from a
+    background thread once flush_bytes are pending or every flush_interval
+    seconds. Whatever is left is flushed at interpreter exit (including
+    sys.exit and KeyboardInterrupt). The file is rotated, gzip-compressed by
+    default, when it would grow past max_bytes.
+    '''
+    def __init__(self, path=LOG_PATH, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 flush_bytes=64 * 1024, flush_interval=2.0, compress=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.compress = compress
+
+        self._buf = []
+        self._pending = 0
+        self._lock = threading.Lock()     # guards the buffer
+        self._io_lock = threading.Lock()  # keeps flushes in order
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="game-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, text):
+        if self._closed:
+            raise ValueError("write to closed LogSink")
+        with self._lock:
+            self._buf.append(text)
+            self._pending += len(text)
+            full = self._pending >= self.flush_bytes
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                if not self._buf:
+                    return
+                text = "".join(self._buf)
+                self._buf = []
+                self._pending = 0
+            data = text.encode("utf-8")
+            try:
+                self._rotate(len(data))
+                with open(self.path, "ab") as f:
+                    f.write(data)
+            except OSError:
+                # put it back ahead of anything written meanwhile
+                with self._lock:
+                    self._buf.insert(0, text)
+                    self._pending += len(text)
+                raise
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError:
+                pass  # retried on the next tick / at exit
+
+    def _backup_name(self, i):
+        return f"{self.path}.{i}" + (".gz" if self.compress else "")
+
+    def _rotate(self, incoming):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size == 0 or size + incoming <= self.max_bytes:
+            return
+
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        oldest = self._backup_name(self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for i in range(self.backups - 1, 0, -1):
+            src = self._backup_name(i)
+            if os.path.exists(src):
+                os.replace(src, self._backup_name(i + 1))
+
+        if self.compress:
+            with open(self.path, "rb") as src, gzip.open(self._backup_name(1), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self._backup_name(1))
+
+_game_log = None
+
+def game_log():
+    # shared sink for game_log.txt, started on first use
+    global _game_log
+    if _game_log is None:
+        _game_log = LogSink()
+    return _game_log
+
+# --- Structured run log ---
+
+# binary records: header (tag, payload length) then the payload
+_REC = struct.Struct("<BI")
+_RUN = struct.Struct("<dq")          # start timestamp, starting capital (+ utf-8 name)
+_WEEK = struct.Struct("<Hqqqq")      # week, income, maint, net, capital
+_COUNT = struct.Struct("<H")
+_BUILD = struct.Struct("<IBH")       # floor, type id, cost
+_MOVEIN = struct.Struct("<IH")       # floor, tenant id
+TAG_RUN, TAG_WEEK = 1, 2
+
+class RunLog:
+    '''
+    Append-only structured log of every run: one run header followed by its
+    week records, either packed binary (fmt="bin") or JSON lines (fmt="jsonl").
+    Each run's byte offset is appended to path + ".idx" so RunLogReader can
+    jump straight to it.
+    '''
+    def __init__(self, path, fmt="bin"):
+        if fmt not in ("bin", "jsonl"):
+            raise ValueError(f"unknown run log format {fmt!r}")
+        self.path = path
+        self.fmt = fmt
+        self._f = open(path, "ab")
+        self._run = None  # the Building whose run is open
+        atexit.register(self.close)
+
+    def start_run(self, b):
+        self._run = b
+        started = time.time()
+        self._f.seek(0, os.SEEK_END)
+        offset = self._f.tell()
+        if self.fmt == "bin":
+            payload = _RUN.pack(started, b.start_capital) + b.tower_name.encode("utf-8")
+            self._f.write(_REC.pack(TAG_RUN, len(payload)) + payload)
+        else:
+            self._write_json({"run": {"name": b.tower_name, "started": started,
+                                      "start_capital": b.start_capital}})
+
+        entry = {"name": b.tower_name, "started": started, "start_capital": b.start_capital,
+                 "offset": offset, "format": self.fmt}
+        with open(self.path + ".idx", "a", encoding="utf-8") as idx:
+            idx.write(json.dumps(entry) + "\n")
+
+    def write_week(self, b, week, income, maint, net, capital):
+        # a new year, or a resumed one, opens its own run
+        if week == 1 or self._run is not b:
+            self.start_run(b)
+        builds = b.build_log.get(week, [])
+        moveins = b.movein_log.get(week, [])
+        if self.fmt == "jsonl":
+            self._write_json({"week": week, "income": income, "maint": maint, "net": net,
+                              "capital": capital, "builds": builds, "moveins": moveins})
+            return
+
+        parts = [_WEEK.pack(week, income, maint, net, capital), _COUNT.pack(len(builds))]
+        parts += [_BUILD.pack(r["floor"], TYPE_ID[r["type"]], r["cost"]) for r in builds]
+        parts.append(_COUNT.pack(len(moveins)))
+        parts += [_MOVEIN.pack(r["floor"], TENANT_ID[r["tenant"]]) for r in moveins]
+        payload = b"".join(parts)
+        self._f.write(_REC.pack(TAG_WEEK, len(payload)) + payload)
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+    def _write_json(self, obj):
+        self._f.write(json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n")
+
+class RunLogReader:
+    '''
+    Reads a RunLog file. runs() lists the index entries; weeks(run) seeks to
+    that run and yields its week records one at a time.
+    '''
+    def __init__(self, path):
+        self.path = path
+
+    def runs(self):
+        with open(self.path + ".idx", encoding="utf-8") as idx:
+            return [json.loads(line) for line in idx if line.strip()]
+
+    def weeks(self, run):
+        with open(self.path, "rb") as f:
+            f.seek(run["offset"])
+            if run.get("format", "bin") == "jsonl":
+                f.readline()  # run header
+                for line in f:
+                    rec = json.loads(line)
+                    if "run" in rec:
+                        return
+                    yield rec
+                return
+
+            tag, length = _REC.unpack(f.read(_REC.size))
+            if tag != TAG_RUN:
+                raise ValueError(f"no run header at offset {run['offset']}")
+            f.seek(length, os.SEEK_CUR)
+            while True:
+                head = f.read(_REC.size)
+                if len(head) < _REC.size:
+                    return
+                tag, length = _REC.unpack(head)
+                if tag == TAG_RUN:
+                    return
+                yield self._decode_week(f.read(length))
+
+    @staticmethod
+    def _decode_week(payload):
+        week, income, maint, net, capital = _WEEK.unpack_from(payload, 0)
+        pos = _WEEK.size
+        (n,) = _COUNT.unpack_from(payload, pos)
+        pos += _COUNT.size
+        builds = []
+        for _ in range(n):
+            floor, type_id, cost = _BUILD.unpack_from(payload, pos)
+            pos += _BUILD.size
+            builds.append({"floor": floor, "type": APT_TYPES[type_id], "cost": cost})
+        (n,) = _COUNT.unpack_from(payload, pos)
+        pos += _COUNT.size
+        moveins = []
+        for _ in range(n):
+            floor, tenant_id = _MOVEIN.unpack_from(payload, pos)
+            pos += _MOVEIN.size
+            moveins.append({"floor": floor, "tenant": TENANTS[tenant_id][0]})
+        return {"week": week, "income": income, "maint": maint, "net": net,
+                "capital": capital, "builds": builds, "moveins": moveins}
+
 # --- Classes ---
 class Apartment:
+    __slots__ = ("floor", "type_id", "base_rent", "tenant")
+
     def __init__(self, floor, apt_type, base_rent):
         self.floor = floor
-        self.apt_type = apt_type
+        self.type_id = TYPE_ID[apt_type]
         self.base_rent = base_rent
         self.tenant = None
 
+    @property
+    def apt_type(self):
+        return APT_TYPES[self.type_id]
+
+    @apt_type.setter
+    def apt_type(self, apt_type):
+        self.type_id = TYPE_ID[apt_type]
+
 class Tenant:
+    __slots__ = ("name", "pref_id")
+
     def __init__(self,name,preference):
         self.name=name
-        self.preference=preference
+        self.pref_id = TYPE_ID[preference] if preference else -1
+
+    @property
+    def preference(self):
+        # read-only: TENANT_POOL entries are shared by every tower
+        return APT_TYPES[self.pref_id] if self.pref_id >= 0 else None
+
+# one shared, immutable Tenant per TENANTS entry (same order)
+TENANT_POOL = [Tenant(n, p) for n, p in TENANTS]
+
+# --- Floor storage for very tall towers ---
+FLOOR_REC = struct.Struct("<hhi")   # theme id, TENANT_POOL index (-1 = empty), base rent
+STORE_BLOCK = 1 << 16               # 64 KiB, a multiple of the mmap granularity
+STORE_HEAD = struct.Struct("<8sq")  # magic, floor count (first block of the file, records follow)
+STORE_MAGIC = b"APTFLR1\0"
+
+def tenant_index(tenant):
+    # stored tenants must be TENANT_POOL entries
+    i = TENANT_ID.get(tenant.name, -1)
+    if i < 0 or TENANT_POOL[i].pref_id != tenant.pref_id:
+        raise ValueError(f"{tenant.name!r} is not a TENANTS entry")
+    return i
+
+class FloorView:
+    # Apartment-like handle on one FloorStore record
+    __slots__ = ("_store", "_i")
+
+    def __init__(self, store, i):
+        self._store = store
+        self._i = i
+
+    @property
+    def floor(self):
+        return self._i + 1
+
+    @property
+    def type_id(self):
+        return self._store.record(self._i)[0]
+
+    @property
+    def apt_type(self):
+        return APT_TYPES[self.type_id]
+
+    @property
+    def base_rent(self):
+        return self._store.record(self._i)[2]
+
+    @property
+    def tenant(self):
+        t = self._store.record(self._i)[1]
+        return TENANT_POOL[t] if t >= 0 else None
+
+    @tenant.setter
+    def tenant(self, tenant):
+        self._store.set_tenant(self._i, -1 if tenant is None else tenant_index(tenant))
+
+class FloorStore:
+    '''
+    Drop-in replacement for Building.floors holding fixed-width floor records
+    in one flat buffer instead of Apartment objects. With a path the records
+    are memory-mapped from that file as a single mapping, remapped each time
+    it doubles, so only the pages in use stay resident, the store costs one
+    mapping however tall the tower, and the tower survives on disk;
+    mode="r+" reopens an existing store.
+    Items are FloorView handles; tenants must come from TENANT_POOL.
+    '''
+    def __init__(self, path=None, mode="w"):
+        self.path = path
+        self._buf = bytearray()  # header block (file only) + records
+        self._base = 0           # offset of the first record in _buf
+        self._n = 0
+        self._file = None
+        if path is None:
+            return
+
+        reopen = mode == "r+" and os.path.exists(path)
+        self._file = open(path, "r+b" if reopen else "w+b")
+        self._base = STORE_BLOCK
+        size = os.fstat(self._file.fileno()).st_size if reopen else 0
+        if size < 2 * STORE_BLOCK:
+            size = 2 * STORE_BLOCK
+            self._file.truncate(size)
+        self._buf = mmap.mmap(self._file.fileno(), size)
+        if not reopen:
+            STORE_HEAD.pack_into(self._buf, 0, STORE_MAGIC, 0)
+            return
+        magic, n = STORE_HEAD.unpack_from(self._buf)
+        if magic != STORE_MAGIC:
+            raise ValueError(f"{path} is not a floor store")
+        self._n = n
+
+    def _grow(self):
+        # double the room for records (at least one block)
+        used = self._base + self._n * FLOOR_REC.size
+        size = self._base + max(2 * (len(self._buf) - self._base), STORE_BLOCK)
+        if self._file is None:
+            buf = bytearray(size)
+            buf[:used] = memoryview(self._buf)[:used]
+            self._buf = buf
+            return
+        self._buf.flush()
+        self._buf.close()
+        self._file.truncate(size)
+        self._buf = mmap.mmap(self._file.fileno(), size)
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("floor index out of range")
+        return FloorView(self, i)
+
+    def __iter__(self):
+        return (FloorView(self, i) for i in range(self._n))
+
+    def __reversed__(self):
+        return (FloorView(self, i) for i in range(self._n - 1, -1, -1))
+
+    def record(self, i):
+        return FLOOR_REC.unpack_from(self._buf, self._base + i * FLOOR_REC.size)
+
+    def set_tenant(self, i, tenant_id):
+        pos = self._base + i * FLOOR_REC.size
+        type_id, _, rent = FLOOR_REC.unpack_from(self._buf, pos)
+        FLOOR_REC.pack_into(self._buf, pos, type_id, tenant_id, rent)
+
+    def append(self, apt):
+        i = self._n
+        pos = self._base + i * FLOOR_REC.size
+        if pos + FLOOR_REC.size > len(self._buf):
+            self._grow()
+        tenant_id = -1 if apt.tenant is None else tenant_index(apt.tenant)
+        FLOOR_REC.pack_into(self._buf, pos, apt.type_id, tenant_id, apt.base_rent)
+        self._n = i + 1
+        if self._file is not None:
+            STORE_HEAD.pack_into(self._buf, 0, STORE_MAGIC, self._n)
+
+    @classmethod
+    def from_buffer(cls, buf, n):
+        # wrap n packed records without copying; the first append copies
+        # them into a buffer with room to grow
+        store = cls()
+        store._buf = buf[:n * FLOOR_REC.size]
+        store._n = n
+        return store
+
+    def write_records(self, f):
+        with memoryview(self._buf) as mv:
+            f.write(mv[self._base:self._base + self._n * FLOOR_REC.size])
+
+    def flush(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._buf.close()
+        self._buf = bytearray()
+        self._file.close()
+        self._file = None
+
+class TowerRenderer:
+    '''
+    Builds the tower display as one frame and writes it with a single call.
+    Each floor's rows are cached until that floor's tenant changes.
+    diff=True (--diff-draw) pins the frame to the top of the terminal and
+    lets the other output scroll below it (ANSI scroll region); a frame of
+    the same height then only rewrites its changed lines. Frames too tall
+    for the terminal are printed in full as usual.
+    '''
+    ROOM = 8  # terminal lines kept free below a pinned frame
+
+    def __init__(self, diff=False, rows=None):
+        self.diff = diff
+        self.rows = rows    # terminal height for diff mode (default: asked on each frame)
+        self._layout = None
+        self._rows = {}     # floor index -> (tenant, (line, line, border)), last frame only
+        self._prev = None   # pinned frame's lines, for diff mode
+        self._pinned = False
+
+    def _set_layout(self, width, indent):
+        if self._layout == (width, indent):
+            return
+        self._layout = (width, indent)
+        self._rows = {}
+        self._prev = None
+        self.IND = " " * indent
+        self.inner = width - 2
+        self.top_border = self.IND + "┌" + "─" * (width - 2) + "┐"
+        self.mid_border = self.IND + "├" + "─" * (width - 2) + "┤"
+        # ground same width as building
+        self.ground_line = self.IND + "▒" * width
+
+    def block(self, a="", b=""):
+        '''
+        Rows of one block in the tower display.
+        a: Apartment type (top)
+        b: Tenant (bottom)
+        '''
+        return (self.IND + "|" + a.center(self.inner) + "|",
+                self.IND + "|" + b.center(self.inner) + "|")
+
+    def floor_rows(self, apt, i, rows):
+        tenant = apt.tenant
+        cached = self._rows.get(i)
+        if cached is None or cached[0] is not tenant:
+            tenant_name = tenant.name if tenant else "---"
+            cached = (tenant, self.block(apt.apt_type, f"Tenant: {tenant_name}") + (self.mid_border,))
+        rows[i] = cached
+        return cached[1]
+
+    def gap(self, count):
+        # stands in for floors outside the window
+        return (self.IND + "|" + f"⋮ {count} floors ⋮".center(self.inner) + "|", self.mid_border)
+
+    def frame(self, b, width=22, indent=4, quiet=False, top=None, window=None):
+        # window: show at most this many floors, from floor `top` (default: the roof) down
+        self._set_layout(width, indent)
+        IND = self.IND
+        lines = []
+        if not quiet:
+            lines += ["", f"========== Week {b.week} =========="]
+        lines.append(self.top_border)
+
+        n = len(b.floors)
+        hi = n if top is None else max(0, min(n, top))
+        lo = 0 if window is None else max(0, hi - window)
+        if hi < n:
+            lines.extend(self.gap(n - hi))
+        rows = {}
+        floors = b.floors
+        for i in range(hi - 1, lo - 1, -1):
+            lines.extend(self.floor_rows(floors[i], i, rows))
+        self._rows = rows
+        if lo > 0:
+            lines.extend(self.gap(lo))
+
+        lines.extend(self.block("GROUND FLOOR", f'<< {b.tower_name} >>'))
+        lines.append(self.ground_line)
+        if not quiet:
+            empty = b.vacancies()
+            lines += ["", f"{IND}🏢 Units: {n}  |  Empty: {empty}/{n}", f"{IND}💰 Capital: {b.capital}", ""]
+        return lines
+
+    def render(self, b, width=22, indent=4, quiet=False, out=None, top=None, window=None):
+        out = out or sys.stdout
+        if not self.diff:
+            out.write("\n".join(self.frame(b, width, indent, quiet, top, window)) + "\n")
+            return
+        # pinned, the full frame stays on screen, so a quiet draw is the same frame
+        out.write(self._diff_text(self.frame(b, width, indent, False, top, window), out))
+
+    def _diff_text(self, lines, out):
+        prev, self._prev = self._prev, None
+        height = len(lines)
+        rows = self.rows or shutil.get_terminal_size().lines
+        if height + self.ROOM > rows:
+            text = "\n".join(lines) + "\n"
+            if self._pinned:
+                self._pinned = False
+                text = "\x1b[r\x1b[2J\x1b[H" + text  # free the scroll region first
+            return text
+
+        self._prev = lines
+        if prev is not None and len(prev) == height:
+            # save the cursor, rewrite the changed lines, restore it
+            return "\x1b7" + "".join(f"\x1b[{i + 1};1H\x1b[2K{line}" for i, line in enumerate(lines)
+                                     if line is not prev[i] and line != prev[i]) + "\x1b8"
+        if not self._pinned:
+            self._pinned = True
+            atexit.register(self._unpin, out, rows)
+        # new height: redraw from the top and scroll only the lines below it
+        return ("\x1b[r\x1b[2J\x1b[H" + "\n".join(lines)
+                + f"\x1b[{height + 1};{rows}r\x1b[{height + 1};1H")
+
+    def _unpin(self, out, rows):
+        if self._pinned:
+            self._pinned = False
+            out.write(f"\x1b[r\x1b[{rows};1H\n")
+            out.flush()
 
 class Building:
-    def __init__(self, starting_capital=STARTING_CAPITAL):
+    def __init__(self, starting_capital=None, max_floors=None, floors=None, rules=DEFAULT_RULES):
+        # starting_capital / max_floors default to the rules'
+        if starting_capital is None:
+            starting_capital = rules.starting_capital
+        self.rules = rules
         self.capital = starting_capital
-        self.floors = []
+        self.max_floors = rules.max_floors if max_floors is None else max_floors
+        self.floors = [] if floors is None else floors  # list of Apartment, or a FloorStore
         self.week = 1
         self.income_history = []
         self.build_log = {}
         self.movein_log = {}
         self.tower_name = ""
+        self.start_capital = starting_capital
+        self.verbose = True  # headless engine turns this off
+        self.log_sink = None  # anything with write(text); defaults to game_log()
+        self.run_log = None   # optional RunLog for structured records
+        self.renderer = None  # TowerRenderer, created on first draw()
+        self.draw_window = None  # show at most this many floors (sandbox towers)
+        self.keep_logs = True    # build_log / movein_log entries (off for sandbox towers)
+
+        # running totals, kept in step by add_floor / assign_tenant
+        self._income = 0      # weekly gross rent of occupied floors
+        self._maint = 0       # type base + height term of every floor
+        self._vacant = 0      # empty floors
+
+        # vacancy index: apt_type -> count, and a stack of candidate floors
+        # (occupied floors are dropped lazily when they reach the top;
+        # None until first needed after loading a snapshot, and for a
+        # FloorStore, whose floors would otherwise cost 8 bytes each in RAM)
+        self._vacant_count = {}
+        self._vacant_floors = None if isinstance(self.floors, FloorStore) else {}
+        if len(self.floors):
+            self.reindex()
 
     def total_floors(self):
         return len(self.floors)
 
+    def vacancies(self):
+        return self._vacant
+
+    def vacancies_of(self, apt_type):
+        return self._vacant_count.get(apt_type, 0)
+
+    def rent_of(self, apt, tenant):
+        rent = apt.base_rent
+        if tenant.pref_id == apt.type_id:
+            rent = int(rent * (1 + self.rules.pref_bonus))
+        return rent
+
+    def floor_maintenance(self, apt):
+        return self.rules.floor_maintenance(apt.apt_type, apt.floor)
+
     def add_floor(self, apt_type):
-        if self.total_floors() >= MAX_FLOORS:
-            print("❌ Cannot build more floors.")
+        if self.total_floors() >= self.max_floors:
+            if self.verbose:
+                print("❌ Cannot build more floors.")
             return False
-        cost = TYPE_BUILD_COST[apt_type]
+        cost = self.rules.build_cost[apt_type]
         if self.capital < cost:
-            print("❌ Not enough capital.")
+            if self.verbose:
+                print("❌ Not enough capital.")
             return False
 
-        base = int(cost * 0.6)
+        base = self.rules.base_rent[apt_type]
         floor_num = self.total_floors() + 1
-        self.floors.append(Apartment(floor_num, apt_type, base))
+        apt = Apartment(floor_num, apt_type, base)
+        self.floors.append(apt)
         self.capital -= cost
-
-        self.build_log.setdefault(self.week, []).append({
-            "floor": floor_num, "type": apt_type, "cost": cost
-        })
-
-        print(f"✅ Built Floor {floor_num}: {apt_type} | Cost {cost} | Capital {self.capital}")
+        self._maint += self.floor_maintenance(apt)
+        self._vacant += 1
+        self._vacant_count[apt_type] = self._vacant_count.get(apt_type, 0) + 1
+        if self._vacant_floors is not None:
+            stack = self._vacant_floors.get(apt_type)
+            if stack is None:
+                stack = self._vacant_floors[apt_type] = array("q")
+            stack.append(floor_num)
+
+        if self.keep_logs:
+            self.build_log.setdefault(self.week, []).append({
+                "floor": floor_num, "type": apt_type, "cost": cost
+            })
+
+        if self.verbose:
+            print(f"✅ Built Floor {floor_num}: {apt_type} | Cost {cost} | Capital {self.capital}")
         return True
 
     def assign_tenant(self, tenant, floor_no):
         if floor_no < 1 or floor_no > self.total_floors():
-            print("❌ Invalid floor.")
+            if self.verbose:
+                print("❌ Invalid floor.")
             return False
         apt = self.floors[floor_no-1]
         if apt.tenant:
-            print("❌ Floor already occupied.")
+            if self.verbose:
+                print("❌ Floor already occupied.")
             return False
         apt.tenant = tenant
+        self._income += self.rent_of(apt, tenant)
+        self._vacant -= 1
+        self._vacant_count[apt.apt_type] -= 1
 
-        self.movein_log.setdefault(self.week, []).append({
-            "floor":floor_no,"tenant":tenant.name
-        })
+        if self.keep_logs:
+            self.movein_log.setdefault(self.week, []).append({
+                "floor":floor_no,"tenant":tenant.name
+            })
 
-        print(f"✅ {tenant.name} moved into Floor {floor_no}")
+        if self.verbose:
+            print(f"✅ {tenant.name} moved into Floor {floor_no}")
         return True
 
+    def vacant_floor(self, apt_type):
+        # any empty floor of this theme, or None
+        if not self._vacant_count.get(apt_type):
+            return None
+        if self._vacant_floors is None:
+            self._index_vacancies()
+        stack = self._vacant_floors[apt_type]
+        while self.floors[stack[-1] - 1].tenant is not None:
+            stack.pop()
+        return stack[-1]
+
+    def best_floor(self, tenant):
+        # (floor, rent) paying the most for this tenant, or (None, 0) if full.
+        # Ties go to the theme fewest tenants prefer.
+        pref = tenant.preference
+        base_rent, bonus = self.rules.base_rent, 1 + self.rules.pref_bonus
+        best, best_key = None, None
+        for apt_type, count in self._vacant_count.items():
+            if not count:
+                continue
+            rent = base_rent[apt_type]
+            if pref == apt_type:
+                rent = int(rent * bonus)
+            key = (rent, -PREF_DEMAND[apt_type])
+            if best_key is None or key > best_key:
+                best, best_key = apt_type, key
+        if best is None:
+            return None, 0
+        return self.vacant_floor(best), best_key[0]
+
+    def best_lease(self, offers):
+        # Rent-maximising assignment of the offered tenants to empty floors.
+        # Only one tenant moves in per action, so the optimal matching is the
+        # single best (tenant, floor) edge. Returns (index, floor, rent).
+        best, best_key = (None, None, 0), None
+        for i, tenant in enumerate(offers):
+            fl, rent = self.best_floor(tenant)
+            if fl is None:
+                continue
+            key = (rent, -PREF_DEMAND[self.floors[fl - 1].apt_type])
+            if best_key is None or key > best_key:
+                best, best_key = (i, fl, rent), key
+        return best
+
     def weekly_maintenance(self):
-        ground = 20 + self.total_floors()
-        cost = 0
-        for apt in self.floors:
-            cost += TYPE_BASE_MAINT[apt.apt_type] + int(1.5 * apt.floor)
-        return ground + cost
+        ground = self.rules.ground_maint + self.total_floors()
+        return ground + self._maint
 
-    def settle_week(self):
-        income = 0
+    def weekly_income(self):
+        return self._income
+
+    def recompute_totals(self):
+        # full scan; only used to verify the running totals
+        income = maint = vacant = 0
         for apt in self.floors:
+            maint += self.floor_maintenance(apt)
             if apt.tenant:
-                rent = apt.base_rent
-                if apt.tenant.preference == apt.apt_type and apt.tenant.preference:
-                    rent = int(rent * (1 + PREF_BONUS))
-                income += rent
+                income += self.rent_of(apt, apt.tenant)
+            else:
+                vacant += 1
+        return income, maint, vacant
+
+    def reindex(self):
+        # rebuild the running totals and vacancy index from self.floors
+        self._income, self._maint, self._vacant = self.recompute_totals()
+        self._index_vacancies(stacks=not isinstance(self.floors, FloorStore))
 
+    def _index_vacancies(self, stacks=True):
+        self._vacant_count = {}
+        self._vacant_floors = {} if stacks else None
+        for apt in self.floors:
+            if apt.tenant is None:
+                apt_type = apt.apt_type
+                self._vacant_count[apt_type] = self._vacant_count.get(apt_type, 0) + 1
+                if stacks:
+                    self._vacant_floors.setdefault(apt_type, array("q")).append(apt.floor)
+
+    def check_totals(self):
+        expected = self.recompute_totals()
+        actual = (self._income, self._maint, self._vacant)
+        if actual != expected:
+            raise RuntimeError(f"Building totals out of sync: {actual} != {expected}")
+
+    def settle_week(self):
+        if CHECK_TOTALS:
+            self.check_totals()
+        income = self._income
         maint = self.weekly_maintenance()
         net = income - maint
         self.capital += net
         self.income_history.append(self.capital)
         return income, maint, net
     
-    def save_week_log(self, week, income, maint, net):
-        with open("game_log.txt", "a", encoding="utf-8") as f:
-            # write title of week log of each round in week1
-            if week == 1:
-                f.write("\n" + "="*50 + "\n")
-                f.write(f"🏢 Building: {self.tower_name}\n")
-                f.write(f"📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"💵 Starting Capital: {self.start_capital}\n")
-                f.write("="*50 + "\n")
-            
-            f.write(f"\n===== Week {week} =====\n")
-            f.write(f"Income: {income}, Maintenance: {maint}, Net: {net}, Capital: {self.capital}\n\n")
+    def fast_forward(self, to_week=TOTAL_WEEKS, log=True):
+        # Nothing changes once no more actions are taken, so every remaining
+        # week settles the same net and capital is an arithmetic series.
+        if CHECK_TOTALS:
+            self.check_totals()
+        start = self.week
+        income = self._income
+        maint = self.weekly_maintenance()
+        net = income - maint
+        base = self.capital
+        weeks = to_week - start + 1
+        if weeks <= 0:
+            return income, maint, net
+
+        self.income_history.extend(range(base + net, base + net * (weeks + 1), net) if net
+                                   else [base] * weeks)
+        self.capital = base + net * weeks
+        self.week = to_week
+
+        if log:
+            self.write_log("".join(
+                self.format_week_log(w, income, maint, net, base + net * (w - start + 1))
+                for w in range(start, to_week + 1)
+            ))
+            if self.run_log:
+                for w in range(start, to_week + 1):
+                    self.run_log.write_week(self, w, income, maint, net, base + net * (w - start + 1))
+        return income, maint, net
 
-            f.write("[Build Log]\n")
-            for r in self.build_log.get(week, []):
-                f.write(f" Built Floor {r['floor']} {r['type']} (Cost {r['cost']})\n")
-            if week not in self.build_log:
-                f.write(" None\n")
+    def format_week_log(self, week, income, maint, net, capital):
+        lines = []
+        # write title of week log of each round in week1
+        if week == 1:
+            lines.append("\n" + "="*50 + "\n")
+            lines.append(f"🏢 Building: {self.tower_name}\n")
+            lines.append(f"📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            lines.append(f"💵 Starting Capital: {self.start_capital}\n")
+            lines.append("="*50 + "\n")
 
-            f.write("\n[Move-in Log]\n")
-            for r in self.movein_log.get(week, []):
-                f.write(f" {r['tenant']} -> Floor {r['floor']}\n")
-            if week not in self.movein_log:
-                f.write(" None\n")
+        lines.append(f"\n===== Week {week} =====\n")
+        lines.append(f"Income: {income}, Maintenance: {maint}, Net: {net}, Capital: {capital}\n\n")
+
+        lines.append("[Build Log]\n")
+        for r in self.build_log.get(week, []):
+            lines.append(f" Built Floor {r['floor']} {r['type']} (Cost {r['cost']})\n")
+        if week not in self.build_log:
+            lines.append(" None\n")
+
+        lines.append("\n[Move-in Log]\n")
+        for r in self.movein_log.get(week, []):
+            lines.append(f" {r['tenant']} -> Floor {r['floor']}\n")
+        if week not in self.movein_log:
+            lines.append(" None\n")
+        return "".join(lines)
+
+    def write_log(self, text):
+        (self.log_sink or game_log()).write(text)
+
+    def save_week_log(self, week, income, maint, net):
+        self.write_log(self.format_week_log(week, income, maint, net, self.capital))
+        if self.run_log:
+            self.run_log.write_week(self, week, income, maint, net, self.capital)
 
     def print_week_log(self, week, income, maint, net):
         print("\n[Weekly Build Log]")
@@ -179,48 +984,133 @@ class Building:
         print(f"Income {income} | Maintenance {maint} | Net {net} | Capital {self.capital}")
 
     # ====== Tower Display ======
-    def draw(self, width: int = 22, indent: int = 4, quiet: bool = False):
-        IND = " " * indent
-        inner = width - 2
-
-        top_border  = IND + "┌" + "─" * (width - 2) + "┐"
-        mid_border  = IND + "├" + "─" * (width - 2) + "┤"
-
-        # ground same width as building
-        ground_line = IND + "▒" * width
-
-        def block(a="", b=""):
-            '''
-            Draw a block in the tower display.
-            a: Tenant name (left)
-            b: Apartment type (right)
-            '''
-            print(IND + "|" + a.center(inner) + "|")
-            print(IND + "|" + b.center(inner) + "|")
-        if not quiet:
-            print(f"\n========== Week {self.week} ==========")
-        print(top_border)
-
-        for apt in reversed(self.floors):
-            room = apt.apt_type
-            tenant_name = apt.tenant.name if apt.tenant else "---"
-            tenant_display = f"Tenant: {tenant_name}"
-            block(room, tenant_display)
-            print(mid_border)
-
-
-        block("GROUND FLOOR", f'<< {self.tower_name} >>')
-        print(ground_line)
-        if not quiet:
-            total = len(self.floors)
-            empty = sum(1 for apt in self.floors if apt.tenant is None)
-            print(f"\n{IND}🏢 Units: {total}  |  Empty: {empty}/{total}")
-            print(f"{IND}💰 Capital: {self.capital}\n")
+    def draw(self, width: int = 22, indent: int = 4, quiet: bool = False, out=None, top=None):
+        if self.renderer is None:
+            self.renderer = TowerRenderer()
+        self.renderer.render(self, width, indent, quiet, out, top, self.draw_window)
+
+    def draw_for_lease(self, tenant, out=None):
+        # blueprint before floor selection; a windowed (sandbox) tower shows the
+        # floors around the best empty one for this tenant instead of the roof
+        n, window = self.total_floors(), self.draw_window
+        if not window or n <= window:
+            self.draw(quiet=True, out=out)
+            return
+        out = out or sys.stdout
+        near, _ = self.best_floor(tenant)
+        top = n if near is None else min(n, max(window, near + window // 2))
+        self.draw(quiet=True, out=out, top=top)
+        out.write(f"Showing floors {top - window + 1}-{top} of {n}\n")
+        free = sorted(fl for fl in map(self.vacant_floor, APT_TYPES) if fl)
+        if free:
+            out.write("Empty floors: " + ", ".join(map(str, free)) + "\n")
+
+# --- Save / resume ---
+SAVE_PATH = "100apt_save.bin"
+SNAPSHOT_MAGIC = b"100APTSV"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEAD = struct.Struct("<8sHIq")  # magic, version, header length, floor count
+SMALL_TOWER = 4096  # towers up to this height load back as Apartment objects
+
+def save_snapshot(b, path=SAVE_PATH, rng=random, record=None):
+    # Header (JSON) + the floor table as packed FLOOR_REC records.
+    # Written to a temp file and renamed, so a crash never leaves half a save.
+    version, internal, gauss = rng.getstate()
+    meta = {
+        "tower_name": b.tower_name, "week": b.week, "capital": b.capital,
+        "start_capital": b.start_capital, "max_floors": b.max_floors,
+        "income_history": b.income_history,
+        "build_log": b.build_log, "movein_log": b.movein_log,
+        "totals": [b._income, b._maint, b._vacant], "vacant_by_type": b._vacant_count,
+        "rules": None if b.rules.is_default() else b.rules.to_dict(),
+        "rng": [version, list(internal), gauss],
+        "record": record,  # GameRecord.to_dict(), so a resumed game keeps recording
+        "saved": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    meta = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    n = b.total_floors()
+    pad = -(SNAPSHOT_HEAD.size + len(meta)) % 8
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_HEAD.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(meta), n))
+        f.write(meta + b"\0" * pad)
+        if isinstance(b.floors, FloorStore):
+            b.floors.write_records(f)
+        else:
+            table = bytearray(n * FLOOR_REC.size)
+            for i, apt in enumerate(b.floors):
+                tenant_id = -1 if apt.tenant is None else tenant_index(apt.tenant)
+                FLOOR_REC.pack_into(table, i * FLOOR_REC.size, apt.type_id, tenant_id, apt.base_rent)
+            f.write(table)
+    os.replace(tmp, path)
+
+def load_snapshot(path=SAVE_PATH, rng=random, record=None):
+    # The file is mapped copy-on-write: tall towers use the floor table in
+    # place (FloorStore.from_buffer), small ones are unpacked to Apartments.
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, version, meta_len, n = SNAPSHOT_HEAD.unpack_from(mm)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a 100APT save")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"{path}: unsupported save version {version}")
+    start = SNAPSHOT_HEAD.size
+    meta = json.loads(mm[start:start + meta_len])
+    start += meta_len + (-(start + meta_len) % 8)
+    table = memoryview(mm)[start:start + n * FLOOR_REC.size]
+
+    if n > SMALL_TOWER:
+        floors = FloorStore.from_buffer(table, n)
+    else:
+        floors = []
+        for i, (type_id, tenant_id, rent) in enumerate(FLOOR_REC.iter_unpack(table)):
+            apt = Apartment(i + 1, APT_TYPES[type_id], rent)
+            if tenant_id >= 0:
+                apt.tenant = TENANT_POOL[tenant_id]
+            floors.append(apt)
+        table.release()
+        mm.close()
+
+    rules = Rules.from_dict(meta["rules"]) if meta.get("rules") else DEFAULT_RULES
+    b = Building(meta["capital"], max_floors=meta["max_floors"], rules=rules)
+    b.floors = floors
+    b.tower_name = meta["tower_name"]
+    b.week = meta["week"]
+    b.start_capital = meta["start_capital"]
+    b.income_history = meta["income_history"]
+    b.build_log = {int(k): v for k, v in meta["build_log"].items()}
+    b.movein_log = {int(k): v for k, v in meta["movein_log"].items()}
+    b._income, b._maint, b._vacant = meta["totals"]
+    b._vacant_count = meta["vacant_by_type"]
+    b._vacant_floors = None  # rebuilt on first vacant_floor()
+    if n > MAX_FLOORS:
+        b.draw_window = SANDBOX_WINDOW
+
+    version, internal, gauss = meta["rng"]
+    rng.setstate((version, tuple(internal), gauss))
+    if record is not None and meta.get("record"):
+        record.load(meta["record"])
+    return b
 
 # --- Input helpers ---
+# The prompts are generators: each one yields the prompt text and is sent the
+# reply, so the same game code runs on the terminal (run_prompts) and on a
+# network session (GameServer).
+def run_prompts(steps, record=None):
+    try:
+        prompt = next(steps)
+        while True:
+            reply = input(prompt)
+            if record is not None:
+                record.replies.append(reply)
+            prompt = steps.send(reply)
+    except StopIteration as done:
+        return done.value
+
 def ask_yes(q):
     while True:
-        c = input(q).strip().lower()
+        c = (yield q).strip().lower()
 
         # Allow exit
         if c in ("q", "quit", "exit"):
@@ -235,7 +1125,7 @@ def ask_yes(q):
         print("Enter y/yes or n/no (or q to quit)")
 
 def safe_int(prompt,low,high):
-    s = input(prompt).strip().lower()
+    s = (yield prompt).strip().lower()
 
     # quit support
     if s in ("q", "quit"):
@@ -254,19 +1144,22 @@ def safe_int(prompt,low,high):
     print(f"❌ Invalid input. Please enter a valid number from {low} to {high}")
     return None
 
-def pick3(arr): 
-    return random.sample(arr,3)
+def pick3(arr, rng=random):
+    return rng.sample(arr,3)
 
-def choose_build():
+def choose_build(hint=None, rng=random, rules=DEFAULT_RULES):
+    # hint(opts, cancel_count) -> advisor line shown under the options
     cancel_count = 0
     while True:
-        opts = pick3(APT_TYPES)
+        opts = pick3(APT_TYPES, rng)
         print("Select apartment type to build:")
         for i, o in enumerate(opts, 1):
-            print(f"  {i}. {o} (Cost {TYPE_BUILD_COST[o]})")
+            print(f"  {i}. {o} (Cost {rules.build_cost[o]})")
         print("  0. Cancel (max 3)")
+        if hint:
+            print(hint(opts, cancel_count))
 
-        c = safe_int("> ", 0, len(opts))
+        c = yield from safe_int("> ", 0, len(opts))
 
         # Invalid — no penalty
         if c is None:
@@ -285,18 +1178,19 @@ def choose_build():
         # Valid selection
         return opts[c - 1]
 
-def choose_tenant():
+def choose_tenant(hint=None, rng=random):
     cancel_count = 0
     while True:
-        cand = pick3(TENANTS)
-        objs = [Tenant(n, p) for n, p in cand]
+        objs = pick3(TENANT_POOL, rng)
         print("Choose tenant:")
         for i, t in enumerate(objs, 1):
             pref = t.preference if t.preference else "None"
             print(f"  {i}. {t.name} (Pref {pref})")
         print("  0. Cancel (3 max)")
+        if hint:
+            print(hint(objs, cancel_count))
 
-        c = safe_int("> ", 0, len(objs))
+        c = yield from safe_int("> ", 0, len(objs))
 
         # invalid input: not counted, no penalty
         if c is None:
@@ -308,7 +1202,7 @@ def choose_tenant():
             cancel_count += 1
             if cancel_count >= 3:
                 print("⚠️ Too many cancellations. Action consumed.")
-                return "FORCE_SPEND", None
+                return "FORCE_SPEND"
             print(f"🔙 Returning to action selection... Choose again. \n⚠️ Only 3 cancellations allowed.({cancel_count}/3).")
             continue
 
@@ -316,108 +1210,138 @@ def choose_tenant():
         return objs[c - 1]
 
 # --- Game ---
-def play(starting_capital=STARTING_CAPITAL, skip_intro=False):
+def new_building(starting_capital, skip_intro, max_floors, floor_store, rules=DEFAULT_RULES):
     if not skip_intro:
         print(f"""
 Welcome to 100APT — Apartment Builder Simulator!
 
 Goal: Build floors, assign tenants, and manage finances.
-Each week you have {ACTIONS_PER_WEEK} actions to grow your building and maximize profit.
+Each week you have {rules.actions_per_week} actions to grow your building and maximize profit.
 
-💡 Tip: Assigning a tenant to their preferred apartment theme grants a +{int(PREF_BONUS*100)}% rent bonus.
+💡 Tip: Assigning a tenant to their preferred apartment theme grants a +{int(rules.pref_bonus*100)}% rent bonus.
 
 Good luck — your real-estate journey starts now! 🏙️
 """)
         
-    if not ask_yes("Start game? (y/n) "):
+    if not (yield from ask_yes("Start game? (y/n) ")):
         print("\n👋 Thanks for checking out 100APT — Apartment Builder Simulator!")
         print("Maybe next time you'll build a legendary skyscraper. 🏙️✨\n")
         sys.exit(0)
     
-    tower_name = input("Name your apartment tower: ").strip()
+    tower_name = (yield "Name your apartment tower: ").strip()
     if tower_name == "":
         tower_name = "Unnamed Tower"
     print(f"\n🏢 Tower: {tower_name}\n")
 
 
-    b = Building(starting_capital)
+    b = Building(starting_capital, max_floors=max_floors,
+                 floors=FloorStore(floor_store) if floor_store else None, rules=rules)
+    if max_floors > MAX_FLOORS:
+        b.draw_window = SANDBOX_WINDOW
     b.tower_name = tower_name
     b.start_capital = starting_capital  # save for game_log
-
-    for wk in range(1, TOTAL_WEEKS+1):
+    return b
+
+def play(*args, **kwargs):
+    return run_prompts(play_steps(*args, **kwargs))
+
+def play_steps(starting_capital=None, skip_intro=False, run_log=None, auto_lease=False,
+               advisor=None, max_floors=None, floor_store=None, resume=None, autosave=None,
+               log_sink=None, rng=random, record=None, quiet=False, rules=DEFAULT_RULES,
+               diff_draw=False):
+    # quiet: no tower drawing or Building messages (replays)
+    # diff_draw: keep the tower pinned on screen and redraw only its changes
+    if resume is not None:
+        b = resume
+        print(f"\n🏢 Tower: {b.tower_name} (resumed after week {b.week})\n")
+        first_week = b.week + 1
+    else:
+        if starting_capital is None:
+            starting_capital = rules.starting_capital
+        if max_floors is None:
+            max_floors = rules.max_floors
+        b = yield from new_building(starting_capital, skip_intro, max_floors, floor_store, rules)
+        first_week = 1
+    b.run_log = run_log
+    b.log_sink = log_sink
+    b.verbose = not quiet
+    if diff_draw:
+        b.renderer = TowerRenderer(diff=True)
+
+    def finish():
+        # year over: save it so --resume can pick up the carried capital
+        if autosave:
+            save_snapshot(b, autosave, rng, record and record.to_dict())
+        if record:
+            record.year_done(b)
+        return b.capital
+
+    for wk in range(first_week, TOTAL_WEEKS+1):
         b.week = wk
-        b.draw()
+        if not quiet:
+            b.draw()
 
         actions = 0
-        while actions < ACTIONS_PER_WEEK:
-            print(f"\n📍 Event {actions+1}/{ACTIONS_PER_WEEK}")
+        per_week = b.rules.actions_per_week
+        while actions < per_week:
+            print(f"\n📍 Event {actions+1}/{per_week}")
             print("Choose an action (1/2/3/4):")
             print(" 1) Build floor")
             print(" 2) Assign tenant")
             print(" 3) Skip turn")
             print(" 4) Fast-forward to end of year")
+            if advisor:
+                print(advisor.action_hint(b, actions))
 
-            choice = input("> ").strip()
+            choice = (yield "> ").strip()
             if choice in ("q", "quit"):
                 print("\n👋 Exiting game early. See you next time!\n")
                 sys.exit(0)
             
             # fast-forward to end of year
             if choice == "4":
-                for remain in range(wk, TOTAL_WEEKS+1):
-                    b.week = remain
-                    income, maint, net = b.settle_week()
-                    b.save_week_log(remain, income, maint, net)
+                b.fast_forward(TOTAL_WEEKS)
                 print("\n⏩ Fast-forward activated! Skipped to year end.")
-                return b.capital
+                return finish()
             
             if choice not in ("1","2","3"):
                 print("❌ Invalid input (no action spent).")
                 continue
             
             # build floor: is_full situation
-            if choice == "1" and b.total_floors() >= MAX_FLOORS:
+            if choice == "1" and b.total_floors() >= b.max_floors:
                 print("🏢 Maximum floors reached.")
 
-                empty_units = sum(1 for apt in b.floors if apt.tenant is None)
+                empty_units = b.vacancies()
 
                 if empty_units > 0:
                     # Floors full, still vacancies
                     print(f"📌 There are still {empty_units} empty units.")
-                    if ask_yes("Do you want to continue leasing this year? (y/n) "):
+                    if (yield from ask_yes("Do you want to continue leasing this year? (y/n) ")):
                         print("🔙 Continue finding tenants.")
                         continue
                     else:
                         # player chooses skip leasing and fast-forward
-                        for remain in range(wk, TOTAL_WEEKS+1):
-                            b.week = remain
-                            income, maint, net = b.settle_week()
-                            b.save_week_log(remain, income, maint, net)
+                        b.fast_forward(TOTAL_WEEKS)
                         print("\n⏩ Fast-forwarded to year end.")
-                        return b.capital
+                        return finish()
                 else:
                     # Floors and tenants both full — perfect state
                     print("🎉 Building is fully constructed AND fully occupied!")
-                    if ask_yes("Skip to year end? (y/n) "):
-                        for remain in range(wk, TOTAL_WEEKS+1):
-                            b.week = remain
-                            income, maint, net = b.settle_week()
-                            b.save_week_log(remain, income, maint, net)
+                    if (yield from ask_yes("Skip to year end? (y/n) ")):
+                        b.fast_forward(TOTAL_WEEKS)
                         print("\n⏩ Everything full — fast-forwarded to year end!")
-                        return b.capital
+                        return finish()
                     print("🔙 Returning to action selection... (no action spent)")
                     continue
 
             # assign tenant: is_full situation
-            if choice == "2" and b.total_floors() >= MAX_FLOORS and all(apt.tenant for apt in b.floors):
+            if choice == "2" and b.total_floors() >= b.max_floors and b.vacancies() == 0:
                 print("🎉 Building is fully constructed AND fully occupied!")
-                if ask_yes("Skip to year end? (y/n) "):
-                    for remain in range(wk, TOTAL_WEEKS+1):
-                        b.week = remain
-                        income, maint, net = b.settle_week()
-                        b.save_week_log(remain, income, maint, net)
+                if (yield from ask_yes("Skip to year end? (y/n) ")):
+                    b.fast_forward(TOTAL_WEEKS)
                     print("\n⏩ Everything full — fast-forwarded to year end!")
-                    return b.capital
+                    return finish()
                 else:
                     print("🔙 Returning to action selection... (no action spent)")
                     continue
@@ -425,7 +1349,8 @@ Good luck — your real-estate journey starts now! 🏙️
             # normal situation
             # build floor
             if choice == "1":
-                t = choose_build()
+                t = yield from choose_build(advisor and (lambda opts, c: advisor.build_hint(b, actions, opts, c)),
+                                            rng, b.rules)
 
                 # forced action spend
                 if t == "FORCE_SPEND":
@@ -449,12 +1374,22 @@ Good luck — your real-estate journey starts now! 🏙️
                     continue
 
                 # check if all floors are occupied
-                if all(apt.tenant for apt in b.floors):
+                if b.vacancies() == 0:
                     print("❌ No available apartments for tenants right now.")
                     print("🔙 Returning to action selection... (no action spent)")
                     continue
 
-                tenant = choose_tenant()
+                if auto_lease:
+                    offers = pick3(TENANT_POOL, rng)
+                    i, fl, rent = b.best_lease(offers)
+                    print("🤖 Auto-lease offers: " + ", ".join(
+                        f"{t.name} (Pref {t.preference or 'None'})" for t in offers))
+                    print(f"🤖 Best match: {offers[i].name} -> Floor {fl} (Rent {rent})")
+                    if b.assign_tenant(offers[i], fl):
+                        actions += 1
+                    continue
+
+                tenant = yield from choose_tenant(advisor and (lambda objs, c: advisor.tenant_hint(b, actions, objs, c)), rng)
                 if tenant == "FORCE_SPEND":
                     actions += 1
                     continue
@@ -465,11 +1400,12 @@ Good luck — your real-estate journey starts now! 🏙️
 
                 # show tower before selection
                 print("\nCurrent Building:")
-                b.draw(quiet=True)  # only show tower blueprint
+                if not quiet:
+                    b.draw_for_lease(tenant)  # only show tower blueprint
 
                 # floor selection loop
                 while True:
-                    fl = safe_int(f"Select floor (1-{b.total_floors()}): ",1,b.total_floors())
+                    fl = yield from safe_int(f"Select floor (1-{b.total_floors()}): ",1,b.total_floors())
 
                     if fl is None:
                         continue
@@ -487,57 +1423,2071 @@ Good luck — your real-estate journey starts now! 🏙️
             b.save_week_log(wk, income, maint, net)  # Save weekly log to file
         except:
             print("Settlement error.")
+
+        if autosave:
+            # week boundary; a resumed game starts at the next week and is
+            # never asked "View weekly log?", so the record answers it here
+            save_snapshot(b, autosave, rng, record and record.to_dict(pending=["n"]))
         
+        if METRICS is not None:
+            METRICS.observe("play.actions_per_week", actions)
+
         # show weekly log
-        if ask_yes("View weekly log? (y/n) "):
+        if (yield from ask_yes("View weekly log? (y/n) ")):
             b.print_week_log(wk, income, maint, net)
 
-    return b.capital
+    if record:
+        record.year_done(b)
+    return b.capital  # last week already saved at its boundary
 
-if __name__ == "__main__":
-    try:
-        capital = STARTING_CAPITAL  # initialize capital
-        first_game = True  # flag
-        
-        while True:
+def game_steps(run_log=None, auto_lease=False, advisor=None, max_floors=None,
+               floor_store=None, resume=None, autosave=None, log_sink=None, rng=random,
+               record=None, quiet=False, rules=DEFAULT_RULES, diff_draw=False):
+    # one building after another, carrying capital over, until the player stops
+    if resume is not None:
+        rules = resume.rules
+    capital = rules.starting_capital  # initialize capital
+    first_game = True  # flag
+    resumed = resume
+
+    while True:
+        if resumed is not None and resumed.week >= TOTAL_WEEKS:
+            # saved after its last week: only the year-end review is left
+            round_start = resumed.start_capital
+            result = resumed.capital
+            print(f"\n🏢 Tower: {resumed.tower_name} (resumed after year end)")
+            if record:
+                record.year_done(resumed)
+        else:
             if not first_game:
                 print(f"💼 You start this project with capital carried over: ${capital}")
-            
-            round_start = capital  # start capital for this round, used for review
 
-            result = play(capital, skip_intro=not first_game)  # only first round show intro
-            capital = result  # carry over capital
-            first_game = False  # skip intro after first round
-            
-            print(f"💰 Final Capital: {result}")
-            if capital <= BANKRUPT_LIMIT:
-                print(f"\n💥 Bankruptcy detected! Resetting capital to ${STARTING_CAPITAL}")
-                print("📉 Real estate is tough... but every tycoon starts somewhere. Try again!")
-                capital = STARTING_CAPITAL
+            round_start = capital if resumed is None else resumed.start_capital  # start capital for this round, used for review
+
+            result = yield from play_steps(capital, skip_intro=not first_game, run_log=run_log,
+                                           auto_lease=auto_lease, advisor=advisor,
+                                           max_floors=max_floors, floor_store=floor_store,
+                                           resume=resumed, autosave=autosave,
+                                           log_sink=log_sink, rng=rng, record=record,
+                                           quiet=quiet, rules=rules,
+                                           diff_draw=diff_draw)  # only first round show intro
+        resumed = None
+        capital = result  # carry over capital
+        first_game = False  # skip intro after first round
+
+        print(f"💰 Final Capital: {result}")
+        if capital <= BANKRUPT_LIMIT:
+            print(f"\n💥 Bankruptcy detected! Resetting capital to ${rules.starting_capital}")
+            print("📉 Real estate is tough... but every tycoon starts somewhere. Try again!")
+            capital = rules.starting_capital
+        else:
+            # Capital review
+            print(f"\n🎉 Year complete!")
+            if capital < round_start:
+                print("🏙️ You survived the year — not easy in real estate! Keep improving.")
+            elif capital == round_start:
+                print("⚖️ Broke even — safe play! Maybe take some risks next time.")
+            else:  # capital > round_start
+                print("💼 Great job, developer! Your building thrived and tenants flourished!")
+
+        # Show log path after each finished building cycle
+        if log_sink is None:
+            game_log().flush()
+            print(f"📁 Log saved at: {os.path.abspath(LOG_PATH)}")
+
+        # Ask if user wants another run
+        if not (yield from ask_yes("\n🏢 Start a new apartment building? (y/n) ")):
+            print("\n👋 Thanks for playing 100APT — See you next time!")
+            return capital
+
+        # Capital carry-over logic
+        # if the player is bankrupt, reset capital
+        print("Preparing your next building...")
+        print("🎉 Your new building awaits!\n")
+
+# --- Headless simulation ---
+class Policy:
+    '''
+    Decision maker for Simulation. Each method answers one prompt of play():
+    action: "1" build, "2" assign tenant, "3" skip, "4" fast-forward
+    build / tenant: 1-3 picks an offer, 0 cancels, None redraws (invalid input)
+    floor: floor number for the chosen tenant
+    '''
+    def action(self, sim):
+        raise NotImplementedError
+
+    def build(self, sim, opts):
+        raise NotImplementedError
+
+    def tenant(self, sim, cands):
+        raise NotImplementedError
+
+    def floor(self, sim, tenant):
+        raise NotImplementedError
+
+    def keep_leasing(self, sim):
+        # floors full but vacancies left
+        return True
+
+    def skip_to_end(self, sim):
+        # floors full and fully occupied
+        return True
+
+class RandomPolicy(Policy):
+    def action(self, sim):
+        return sim.rng.choice("123")
+
+    def build(self, sim, opts):
+        return sim.rng.randint(0, len(opts))
+
+    def tenant(self, sim, cands):
+        return sim.rng.randint(0, len(cands))
+
+    def floor(self, sim, tenant):
+        empty = [apt.floor for apt in sim.building.floors if apt.tenant is None]
+        return sim.rng.choice(empty)
+
+class AutoLeasePolicy(Policy):
+    # leasing half of a policy: always takes the rent-maximising offer
+    def tenant(self, sim, cands):
+        i, fl, _ = sim.building.best_lease(cands)
+        self._floor = fl
+        return i + 1
+
+    def floor(self, sim, tenant):
+        return self._floor
+
+def worth_building(b, apt_type):
+    # a new floor of this theme pays back its cost before year end (once leased)
+    r = b.rules
+    weekly = r.base_rent[apt_type] - r.floor_maintenance(apt_type, b.total_floors() + 1) - 1
+    return weekly * (TOTAL_WEEKS - b.week) > r.build_cost[apt_type]
+
+class CheapestBuildPolicy(Policy):
+    # greedy: build the cheapest offer whenever affordable, otherwise lease
+    def action(self, sim):
+        b = sim.building
+        if b.total_floors() < b.max_floors and b.capital >= b.rules.min_cost:
+            return "1"
+        return "2" if b.vacancies() else "3"
+
+    def build(self, sim, opts):
+        cost = sim.building.rules.build_cost
+        i = min(range(len(opts)), key=lambda k: cost[opts[k]])
+        return i + 1 if sim.building.capital >= cost[opts[i]] else 0
+
+    def tenant(self, sim, cands):
+        return 1
+
+    def floor(self, sim, tenant):
+        return sim.building.best_floor(tenant)[0]
+
+class BuildThenLeasePolicy(AutoLeasePolicy):
+    # fill every vacancy first, then build the best-paying offer worth its cost
+    def action(self, sim):
+        b = sim.building
+        if b.vacancies():
+            return "2"
+        if b.total_floors() < b.max_floors and any(worth_building(b, t) for t in APT_TYPES):
+            return "1" if b.capital >= b.rules.min_cost else "3"
+        return "4"  # nothing left worth doing this year
+
+    def build(self, sim, opts):
+        b = sim.building
+        r = b.rules
+        ok = [i for i, t in enumerate(opts) if b.capital >= r.build_cost[t] and worth_building(b, t)]
+        if not ok:
+            return 0
+        return max(ok, key=lambda i: r.base_rent[opts[i]] - r.base_maint[opts[i]]) + 1
+
+class PrefLeasePolicy(BuildThenLeasePolicy):
+    # like build-then-lease, but redraws tenants (free cancels) to find a preference match
+    def tenant(self, sim, cands):
+        b = sim.building
+        for i, t in enumerate(cands):
+            if t.preference and b.vacancies_of(t.preference):
+                self._floor = b.vacant_floor(t.preference)
+                return i + 1
+        if sim.cancels < 2:
+            return 0
+        return super().tenant(sim, cands)
+
+class Simulation:
+    '''
+    Runs one year of play() rules against a Building with no printing and no
+    terminal I/O. All decisions come from the policy; offers are drawn from rng.
+    '''
+    MAX_STALL = 1000  # decisions in a row that spend no action
+
+    def __init__(self, policy, starting_capital=None, rng=None, tower_name="", log=False,
+                 rules=DEFAULT_RULES):
+        self.policy = policy
+        self.rng = rng if rng is not None else random.Random()
+        self.log = log
+        self.building = Building(starting_capital, rules=rules)
+        self.building.tower_name = tower_name
+        self.building.verbose = False
+        self.actions = 0
+        self.cancels = 0  # cancellations used in the current build/tenant menu
+
+    def run(self):
+        b = self.building
+        for wk in range(b.week, TOTAL_WEEKS+1):
+            b.week = wk
+            if not self.play_week():
+                return self.fast_forward()
+
+            income, maint, net = b.settle_week()
+            if self.log:
+                b.save_week_log(wk, income, maint, net)
+
+        return b.capital
+
+    def play_week(self):
+        # the actions of week b.week; False if the policy ends the year instead
+        b = self.building
+        policy = self.policy
+        per_week = b.rules.actions_per_week
+        self.actions = 0
+        stall = 0
+        while self.actions < per_week:
+            stall += 1
+            if stall > self.MAX_STALL:
+                raise RuntimeError("policy keeps choosing actions that spend nothing")
+            spent = self.actions
+
+            choice = policy.action(self)
+            if choice == "4":
+                return False
+
+            full = b.total_floors() >= b.max_floors
+            if choice == "1" and full:
+                empty_units = b.vacancies()
+                if empty_units > 0:
+                    if policy.keep_leasing(self):
+                        continue
+                    return False
+                if policy.skip_to_end(self):
+                    return False
+                continue
+
+            if choice == "2" and full and b.vacancies() == 0:
+                if policy.skip_to_end(self):
+                    return False
+                continue
+
+            if choice == "1":
+                self._build()
+            elif choice == "2":
+                self._lease()
+            elif choice == "3":
+                self.actions += 1
             else:
-                # Capital review
-                print(f"\n🎉 Year complete!")
-                if capital < round_start:
-                    print("🏙️ You survived the year — not easy in real estate! Keep improving.")
-                elif capital == round_start:
-                    print("⚖️ Broke even — safe play! Maybe take some risks next time.")
-                else:  # capital > round_start
-                    print("💼 Great job, developer! Your building thrived and tenants flourished!")
-
-            # Show log path after each finished building cycle
-            log_path = os.path.join(os.getcwd(), "game_log.txt")
-            print(f"📁 Log saved at: {log_path}")
-
-            # Ask if user wants another run
-            if not ask_yes("\n🏢 Start a new apartment building? (y/n) "):
-                print("\n👋 Thanks for playing 100APT — See you next time!")
-                sys.exit(0)
+                raise ValueError(f"invalid action {choice!r}")
+
+            if self.actions != spent:
+                stall = 0
+        return True
+
+    def fast_forward(self):
+        self.building.fast_forward(TOTAL_WEEKS, log=self.log)
+        return self.building.capital
+
+    def _build(self):
+        self.cancels = 0
+        while True:
+            opts = pick3(APT_TYPES, self.rng)
+            c = self.policy.build(self, opts)
+            if c is None:
+                continue
+            if c == 0:
+                self.cancels += 1
+                if self.cancels >= 3:
+                    self.actions += 1  # FORCE_SPEND
+                    return
+                continue
+            if self.building.add_floor(opts[c - 1]):
+                self.actions += 1
+            return
+
+    def _lease(self):
+        b = self.building
+        if b.total_floors() == 0 or b.vacancies() == 0:
+            return
+        self.cancels = 0
+        while True:
+            objs = pick3(TENANT_POOL, self.rng)
+            c = self.policy.tenant(self, objs)
+            if c is None:
+                continue
+            if c == 0:
+                self.cancels += 1
+                if self.cancels >= 3:
+                    self.actions += 1  # FORCE_SPEND
+                    return
+                continue
+            tenant = objs[c - 1]
+            break
+
+        fl = self.policy.floor(self, tenant)
+        if not 1 <= fl <= b.total_floors():
+            raise ValueError(f"invalid floor {fl!r}")
+        if b.assign_tenant(tenant, fl):
+            self.actions += 1
+
+def simulate_year(policy, starting_capital=None, seed=None):
+    return Simulation(policy, starting_capital, rng=random.Random(seed)).run()
+
+def simulate_years(policy, years, starting_capital=None, seed=None, rules=DEFAULT_RULES, log=False):
+    # game_steps() without a player: a new tower every year on the capital
+    # carried over, reset to the rules' starting capital after a year that
+    # ends at or below BANKRUPT_LIMIT. Returns each year's final capital.
+    rng = random.Random(seed)
+    capital = rules.starting_capital if starting_capital is None else starting_capital
+    finals = []
+    for year in range(1, years + 1):
+        sim = Simulation(policy, capital, rng=rng, tower_name=f"Tower {year}", log=log, rules=rules)
+        capital = sim.run()
+        finals.append(capital)
+        if capital <= BANKRUPT_LIMIT:
+            capital = rules.starting_capital
+    return finals
+
+# --- Batched towers (NumPy) ---
+np = None  # NumPy, imported by the first TowerBatch; nothing else needs it
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("TowerBatch needs NumPy (pip install numpy)") from None
+        np = numpy
+    return np
+
+class TowerBatch:
+    '''
+    Many towers stored column-wise, (towers x floors) arrays of theme id,
+    base rent, tenant preference id and occupancy, plus per-tower capital and
+    height, so settle_week() is one vectorised call for the whole batch.
+    Results match Building under the same rules exactly, including the int()
+    truncations. Needs NumPy, imported on first use.
+    '''
+    def __init__(self, count, starting_capital=None, capacity=None, rules=DEFAULT_RULES):
+        _load_numpy()
+        if starting_capital is None:
+            starting_capital = rules.starting_capital
+        if capacity is None:
+            capacity = rules.max_floors
+        self.rules = rules
+        self.count = count
+        self.capacity = capacity
+        self.week = 1
+        self.capital = np.full(count, starting_capital, dtype=np.int64)
+        self.heights = np.zeros(count, dtype=np.int64)
+        self.floor = np.arange(1, capacity + 1, dtype=np.int64)   # floor number per column
+        self.type_id = np.full((count, capacity), -1, dtype=np.int16)
+        self.base_rent = np.zeros((count, capacity), dtype=np.int64)
+        self.pref_id = np.full((count, capacity), -1, dtype=np.int16)
+        self.occupied = np.zeros((count, capacity), dtype=bool)
+
+        self._cost = np.array([rules.build_cost[t] for t in APT_TYPES], dtype=np.int64)
+        self._rent = np.array([rules.base_rent[t] for t in APT_TYPES], dtype=np.int64)
+        self._maint = np.array([rules.base_maint[t] for t in APT_TYPES], dtype=np.int64)
+
+    @classmethod
+    def from_buildings(cls, buildings, capacity=None):
+        # the buildings must share one set of rules, which the batch takes on
+        rules = buildings[0].rules if buildings else DEFAULT_RULES
+        if any(b.rules.to_dict() != rules.to_dict() for b in buildings):
+            raise ValueError("TowerBatch towers must share one set of rules")
+        if capacity is None:
+            capacity = max([rules.max_floors] + [b.total_floors() for b in buildings])
+        batch = cls(len(buildings), capacity=capacity, rules=rules)
+        for i, b in enumerate(buildings):
+            batch.capital[i] = b.capital
+            batch.heights[i] = b.total_floors()
+            for j, apt in enumerate(b.floors):
+                batch.type_id[i, j] = apt.type_id
+                batch.base_rent[i, j] = apt.base_rent
+                if apt.tenant:
+                    batch.pref_id[i, j] = apt.tenant.pref_id
+                    batch.occupied[i, j] = True
+        batch.week = max((b.week for b in buildings), default=1)
+        return batch
+
+    def add_floors(self, towers, type_ids):
+        # one new floor per listed tower; returns the mask of builds that happened
+        towers = np.asarray(towers, dtype=np.int64)
+        type_ids = np.asarray(type_ids, dtype=np.int64)
+        if len(np.unique(towers)) != len(towers):
+            raise ValueError("add_floors takes each tower at most once per call")
+        cost = self._cost[type_ids]
+        ok = (self.heights[towers] < self.capacity) & (self.capital[towers] >= cost)
+        t, ty, col = towers[ok], type_ids[ok], self.heights[towers[ok]]
+        self.type_id[t, col] = ty
+        self.base_rent[t, col] = self._rent[ty]
+        self.capital[t] -= cost[ok]
+        self.heights[t] += 1
+        return ok
+
+    def assign_tenants(self, towers, floors, pref_ids):
+        # move tenants (by preference id, -1 = none) into empty floors
+        towers = np.asarray(towers, dtype=np.int64)
+        col = np.asarray(floors, dtype=np.int64) - 1
+        if np.unique(np.stack((towers, col)), axis=1).shape[1] != len(towers):
+            raise ValueError("assign_tenants takes each (tower, floor) at most once per call")
+        ok = (col >= 0) & (col < self.heights[towers])
+        ok[ok] = ~self.occupied[towers[ok], col[ok]]
+        self.pref_id[towers[ok], col[ok]] = np.asarray(pref_ids, dtype=np.int16)[ok]
+        self.occupied[towers[ok], col[ok]] = True
+        return ok
+
+    def weekly_income(self):
+        rent = self.base_rent
+        match = self.occupied & (self.pref_id == self.type_id)
+        rent = np.where(match, (rent * (1 + self.rules.pref_bonus)).astype(np.int64), rent)
+        return np.where(self.occupied, rent, 0).sum(axis=1)
+
+    def weekly_maintenance(self):
+        built = self.floor[None, :] <= self.heights[:, None]
+        per_floor = (self._maint[np.maximum(self.type_id, 0)]
+                     + (self.rules.height_rate * self.floor).astype(np.int64))
+        return self.rules.ground_maint + self.heights + np.where(built, per_floor, 0).sum(axis=1)
+
+    def settle_week(self):
+        income = self.weekly_income()
+        maint = self.weekly_maintenance()
+        net = income - maint
+        self.capital += net
+        return income, maint, net
+
+# --- Strategy solver ---
+def _offer_weights(n):
+    # P(the best item of a random 3-of-n draw is the k-th best overall)
+    total = math.comb(n, 3)
+    return [math.comb(n - 1 - k, 2) / total for k in range(n)]
+
+BUILD_WEIGHTS = _offer_weights(len(APT_TYPES))
+TENANT_WEIGHTS = _offer_weights(len(TENANTS))
+TENANT_PREF_ID = [t.pref_id for t in TENANT_POOL]
+NO_OPTION = float("-inf")
+
+def expected_best(values, weights, fallback):
+    # E[max(best of a random 3-draw, fallback)]
+    values = sorted(values, reverse=True)
+    return sum(w * (v if v > fallback else fallback) for v, w in zip(values, weights))
+
+def solver_state(b, actions):
+    n = b.total_floors()
+    vac = tuple(b.vacancies_of(t) for t in APT_TYPES)
+    return (b.week, actions, b.capital, n, b.weekly_income(),
+            b.weekly_maintenance() - b.rules.ground_maint - n, vac)
+
+class Solver:
+    '''
+    Depth-limited expectimax over a compressed year state
+    (week, action, capital, floors, weekly rent, floor maintenance, vacancies per theme).
+    Offer draws are taken in expectation exactly, cancellations included.
+    Past `depth` actions the rest of the year is estimated as the current
+    weekly net plus the rent of filling vacancies with the remaining actions.
+    Values are the capital gained by year end. Capital is bucketed (and
+    capped where it no longer limits building) before memoising, with at
+    most cache_size states kept.
+    Plays under `rules` with a floor limit of max_floors (default: the
+    rules'); for_building() swaps in a solver matching a given tower.
+    '''
+    def __init__(self, depth=2, bucket=10, cache_size=200_000, rules=DEFAULT_RULES, max_floors=None):
+        self.depth = depth
+        self.bucket = bucket
+        self.cache_size = cache_size
+        self.rules = rules
+        self.max_floors = rules.max_floors if max_floors is None else max_floors
+        self.per_week = rules.actions_per_week
+        self.ground = rules.ground_maint
+        self.cost = [rules.build_cost[t] for t in APT_TYPES]
+        self.rent = [rules.base_rent[t] for t in APT_TYPES]
+        self.pref_rent = [int(r * (1 + rules.pref_bonus)) for r in self.rent]
+        self.by_rent = sorted(range(len(APT_TYPES)), key=lambda i: -self.rent[i])
+        self.cap_ceiling = max(self.cost) * (depth + 1)
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._value)
+
+    def for_building(self, b):
+        # this solver if it plays b's rules and floor limit, else a fresh one that does
+        if b.max_floors == self.max_floors and (b.rules is self.rules
+                                                 or b.rules.to_dict() == self.rules.to_dict()):
+            return self
+        return Solver(self.depth, self.bucket, self.cache_size, b.rules, b.max_floors)
+
+    # ---- state transitions ----
+    def value(self, state, d):
+        week, act, cap, *rest = state
+        cap = min(cap, self.cap_ceiling) // self.bucket * self.bucket
+        return self._cached((week, act, cap, *rest), d)
+
+    def step(self, week, act, cap, n, inc, mf, vac):
+        # spend one action; settle the week after its last one
+        act += 1
+        if act < self.per_week:
+            return 0, (week, act, cap, n, inc, mf, vac)
+        net = inc - (self.ground + n + mf)
+        return net, (week + 1, 0, cap + net, n, inc, mf, vac)
+
+    def estimate(self, state):
+        week, act, cap, n, inc, mf, vac = state
+        weeks = TOTAL_WEEKS - week + 1
+        gain = weeks * (inc - (self.ground + n + mf))
+        # lease vacancies, best rent first, one per remaining action
+        k = act
+        for i in self.by_rent:
+            for _ in range(vac[i]):
+                paid = weeks - k // self.per_week
+                if paid <= 0:
+                    return gain
+                gain += paid * self.rent[i]
+                k += 1
+        return gain
+
+    def _value(self, state, d):
+        if state[0] > TOTAL_WEEKS:
+            return 0
+        if d == 0:
+            return self.estimate(state)
+        return max(self.action_values(state, d).values())
+
+    # ---- menus ----
+    def action_values(self, state, d=None):
+        d = self.depth if d is None else d
+        week, act, cap, n, inc, mf, vac = state
+        values = {}
+        if n < self.max_floors:
+            values["1"] = self.build_menu(state, d)[0]
+        if any(vac):
+            values["2"] = self.lease_menu(state, d)[0]
+        g, nxt = self.step(*state)
+        values["3"] = g + self.value(nxt, d - 1)
+        # fast-forward last, so ties keep the year open
+        values["4"] = (TOTAL_WEEKS - week + 1) * (inc - (self.ground + n + mf))
+        return values
+
+    def build_values(self, state, d):
+        # value of building each theme, or NO_OPTION if unaffordable
+        week, act, cap, n, inc, mf, vac = state
+        out = {}
+        for i, t in enumerate(APT_TYPES):
+            cost = self.cost[i]
+            if cap < cost:
+                out[t] = NO_OPTION
+                continue
+            mf2 = mf + self.rules.floor_maintenance(t, n + 1)
+            vac2 = vac[:i] + (vac[i] + 1,) + vac[i + 1:]
+            g, nxt = self.step(week, act, cap - cost, n + 1, inc, mf2, vac2)
+            out[t] = g - cost + self.value(nxt, d - 1)
+        return out
+
+    def lease_values(self, state, d):
+        # best (value, theme id) for a tenant of each preference id (-1 = none)
+        week, act, cap, n, inc, mf, vac = state
+
+        def place(i, matched):
+            rent = self.pref_rent[i] if matched else self.rent[i]
+            vac2 = vac[:i] + (vac[i] - 1,) + vac[i + 1:]
+            g, nxt = self.step(week, act, cap, n, inc + rent, mf, vac2)
+            return g + self.value(nxt, d - 1)
+
+        plain = sorted(((place(i, False), i) for i in range(len(vac)) if vac[i]), reverse=True)
+        out = {}
+        for p in set(TENANT_PREF_ID):
+            best = next((v for v in plain if v[1] != p), (NO_OPTION, None))
+            if p >= 0 and vac[p]:
+                best = max(best, (place(p, True), p))
+            out[p] = best
+        return out
+
+    def _menu(self, values, weights, state, d):
+        # menu value with 0, 1 or 2 cancellations already used
+        g, nxt = self.step(*state)
+        forced = g + self.value(nxt, d - 1)  # third cancel spends the action
+        v2 = expected_best(values, weights, forced)
+        v1 = expected_best(values, weights, v2)
+        v0 = expected_best(values, weights, v1)
+        return v0, v1, v2, forced
+
+    def build_menu(self, state, d):
+        return self._menu(self.build_values(state, d).values(), BUILD_WEIGHTS, state, d)
+
+    def lease_menu(self, state, d):
+        by_pref = self.lease_values(state, d)
+        return self._menu([by_pref[p][0] for p in TENANT_PREF_ID], TENANT_WEIGHTS, state, d)
+
+    # ---- decisions ----
+    def best_action(self, state):
+        values = self.action_values(state)
+        return max(values, key=values.get), values
+
+    def best_build(self, state, opts, cancels):
+        # (choice 0-3, value); 0 means cancel and redraw
+        d = self.depth
+        values = self.build_values(state, d)
+        cancel = self.build_menu(state, d)[cancels + 1]
+        choice, best = 0, cancel
+        for i, t in enumerate(opts, 1):
+            if values[t] > best:
+                choice, best = i, values[t]
+        return choice, best
+
+    def best_tenant(self, state, cands, cancels):
+        # (choice 0-3, theme to place them on, value)
+        d = self.depth
+        by_pref = self.lease_values(state, d)
+        cancel = self.lease_menu(state, d)[cancels + 1]
+        choice, theme, best = 0, None, cancel
+        for i, t in enumerate(cands, 1):
+            v, j = by_pref[t.pref_id]
+            if v > best:
+                choice, theme, best = i, APT_TYPES[j], v
+        return choice, theme, best
+
+class SolverPolicy(Policy):
+    def __init__(self, solver=None):
+        self.solver = solver or Solver()
+        self._theme = None
+
+    def _solver(self, b):
+        self.solver = self.solver.for_building(b)
+        return self.solver
+
+    def action(self, sim):
+        return self._solver(sim.building).best_action(solver_state(sim.building, sim.actions))[0]
+
+    def build(self, sim, opts):
+        state = solver_state(sim.building, sim.actions)
+        return self._solver(sim.building).best_build(state, opts, sim.cancels)[0]
+
+    def tenant(self, sim, cands):
+        state = solver_state(sim.building, sim.actions)
+        choice, self._theme, _ = self._solver(sim.building).best_tenant(state, cands, sim.cancels)
+        return choice
+
+    def floor(self, sim, tenant):
+        return sim.building.vacant_floor(self._theme)
+
+    def keep_leasing(self, sim):
+        values = self._solver(sim.building).action_values(solver_state(sim.building, sim.actions))
+        return values.get("2", NO_OPTION) > values["4"]
+
+STRATEGIES = {
+    "random": RandomPolicy,
+    "cheapest": CheapestBuildPolicy,
+    "build-then-lease": BuildThenLeasePolicy,
+    "pref-lease": PrefLeasePolicy,
+    "solver": lambda: SolverPolicy(Solver(depth=1)),
+}
+
+class Advisor:
+    # solver hints shown during interactive play (--advisor)
+    NAMES = {"1": "Build floor", "2": "Assign tenant", "3": "Skip turn", "4": "Fast-forward"}
+
+    def __init__(self, solver=None):
+        self.solver = solver or Solver()
+
+    def _solver(self, b):
+        # follow the tower's rules and floor limit (--rules, --max-floors, a resumed save)
+        self.solver = self.solver.for_building(b)
+        return self.solver
+
+    def action_hint(self, b, actions):
+        state = solver_state(b, actions)
+        choice, values = self._solver(b).best_action(state)
+        return f"💡 Advisor: {self.NAMES[choice]} (expected year-end capital {b.capital + values[choice]:.0f})"
+
+    def build_hint(self, b, actions, opts, cancels):
+        choice, value = self._solver(b).best_build(solver_state(b, actions), opts, cancels)
+        pick = f"{choice}. {opts[choice - 1]}" if choice else "0. Cancel"
+        return f"💡 Advisor: {pick} (expected year-end capital {b.capital + value:.0f})"
+
+    def tenant_hint(self, b, actions, cands, cancels):
+        choice, theme, value = self._solver(b).best_tenant(solver_state(b, actions), cands, cancels)
+        if not choice:
+            return f"💡 Advisor: 0. Cancel (expected year-end capital {b.capital + value:.0f})"
+        return (f"💡 Advisor: {choice}. {cands[choice - 1].name} -> Floor {b.vacant_floor(theme)} ({theme})"
+                f" (expected year-end capital {b.capital + value:.0f})")
+
+# --- Forecast ---
+class Forecaster:
+    '''
+    What-if lines for the menus (--forecast): for every build or tenant
+    offer, the year-end capital and payback week if it is taken now and
+    nothing else changes. Each projection starts from the Building's
+    running weekly totals, so it costs the same on any tower height.
+    Wraps an Advisor, whose hints are still shown underneath.
+    '''
+    def __init__(self, advisor=None):
+        self.advisor = advisor
+
+    @staticmethod
+    def outlook(b):
+        # (settlements left including this week, weekly net now, year-end capital as things stand)
+        weeks = TOTAL_WEEKS - b.week + 1
+        net = b.weekly_income() - b.weekly_maintenance()
+        return weeks, net, b.capital + net * weeks
+
+    @staticmethod
+    def build_option(b, apt_type):
+        # (year-end if left empty, year-end if leased this week, payback week or None)
+        r = b.rules
+        weeks, net, _ = Forecaster.outlook(b)
+        cost = r.build_cost[apt_type]
+        upkeep = r.floor_maintenance(apt_type, b.total_floors() + 1) + 1  # +1: ground term per floor
+        gain = r.base_rent[apt_type] - upkeep
+        empty = b.capital - cost + (net - upkeep) * weeks
+        leased = empty + r.base_rent[apt_type] * weeks
+        payback = b.week + -(-cost // gain) - 1 if gain > 0 else None
+        return empty, leased, payback if payback is not None and payback <= TOTAL_WEEKS else None
+
+    @staticmethod
+    def lease_option(b, tenant):
+        # (floor, weekly rent, year-end capital) for the tenant's best empty floor
+        weeks, net, _ = Forecaster.outlook(b)
+        fl, rent = b.best_floor(tenant)
+        if fl is None:
+            return None, 0, b.capital + net * weeks
+        return fl, rent, b.capital + (net + rent) * weeks
+
+    def _with_advisor(self, lines, hint):
+        if self.advisor:
+            lines.append(hint())
+        return "\n".join(lines)
+
+    def action_hint(self, b, actions):
+        weeks, net, end = self.outlook(b)
+        line = f"📈 Forecast: year-end capital {end} if nothing changes ({net:+}/week, {weeks} weeks left)"
+        return self._with_advisor([line], lambda: self.advisor.action_hint(b, actions))
+
+    def build_hint(self, b, actions, opts, cancels):
+        lines = []
+        for i, t in enumerate(opts, 1):
+            if b.capital < b.rules.build_cost[t]:
+                lines.append(f"📈 {i}. {t}: can't afford")
+                continue
+            empty, leased, payback = self.build_option(b, t)
+            paid = f"pays back in week {payback}" if payback else "won't pay back this year"
+            lines.append(f"📈 {i}. {t}: year-end {leased} once leased ({empty} empty), {paid}")
+        return self._with_advisor(lines, lambda: self.advisor.build_hint(b, actions, opts, cancels))
+
+    def tenant_hint(self, b, actions, cands, cancels):
+        lines = []
+        for i, t in enumerate(cands, 1):
+            fl, rent, end = self.lease_option(b, t)
+            if fl is None:
+                lines.append(f"📈 {i}. {t.name}: no empty floor")
+                continue
+            bonus = " with pref bonus" if t.preference == b.floors[fl - 1].apt_type else ""
+            lines.append(f"📈 {i}. {t.name}: Floor {fl} at {rent}/week{bonus}, year-end {end}")
+        return self._with_advisor(lines, lambda: self.advisor.tenant_hint(b, actions, cands, cancels))
+
+# --- Tournament ---
+# the solver plans every action and runs far slower; ask for it with -s
+TOURNAMENT_DEFAULT = [name for name in STRATEGIES if name != "solver"]
+
+def _tournament_chunk(task):
+    name, seed, start, years = task
+    # independent, reproducible stream per (seed, strategy, year), so the
+    # results do not depend on how the years are split between workers
+    policy = STRATEGIES[name]()
+    out = array("q")
+    for year in range(start, start + years):
+        out.append(Simulation(policy, rng=random.Random(f"{seed}:{name}:{year}")).run())
+    return name, start, out
+
+def summarize(capitals):
+    xs = sorted(capitals)
+    n = len(xs)
+    mean = sum(xs) / n
+    sd = math.sqrt(sum((x - mean) ** 2 for x in xs) / (n - 1)) if n > 1 else 0.0
+    half = 1.96 * sd / math.sqrt(n)
+
+    def pct(p):
+        return xs[min(n - 1, max(0, math.ceil(p / 100 * n) - 1))]
+
+    # Wilson interval for the bankruptcy rate
+    bust = sum(1 for x in xs if x <= BANKRUPT_LIMIT) / n
+    z = 1.96
+    centre = (bust + z * z / (2 * n)) / (1 + z * z / n)
+    spread = z * math.sqrt(bust * (1 - bust) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return {
+        "years": n, "mean": mean, "mean_ci95": [mean - half, mean + half],
+        "p5": pct(5), "p50": pct(50), "p95": pct(95),
+        "bankrupt_rate": bust, "bankrupt_ci95": [max(0.0, centre - spread), min(1.0, centre + spread)],
+    }
+
+def run_tournament(args):
+    names = args.strategies or TOURNAMENT_DEFAULT
+    for name in names:
+        if name not in STRATEGIES:
+            raise SystemExit(f"unknown strategy {name!r} (choose from {', '.join(STRATEGIES)})")
+
+    # one chunk of years per worker and strategy
+    workers = args.workers or os.cpu_count() or 1
+    size = max(1, -(-args.years // workers))
+    tasks = []
+    for name in names:
+        for start in range(0, args.years, size):
+            tasks.append((name, args.seed, start, min(size, args.years - start)))
+
+    results = {name: {} for name in names}
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for name, start, caps in pool.map(_tournament_chunk, tasks):
+            results[name][start] = caps
+    elapsed = time.perf_counter() - t0
+
+    report = {}
+    for name in names:
+        caps = array("q")
+        for start in sorted(results[name]):
+            caps.extend(results[name][start])
+        report[name] = summarize(caps)
+
+    print(f"🏁 {args.years} years x {len(names)} strategies in {elapsed:.1f}s (seed {args.seed})")
+    print(f"{'strategy':<18}{'mean':>10}{'95% CI':>22}{'p5':>9}{'p50':>9}{'p95':>9}{'bankrupt':>10}")
+    for name, r in report.items():
+        lo, hi = r["mean_ci95"]
+        print(f"{name:<18}{r['mean']:>10.0f}{f'[{lo:.0f}, {hi:.0f}]':>22}"
+              f"{r['p5']:>9}{r['p50']:>9}{r['p95']:>9}{r['bankrupt_rate']:>10.2%}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"seed": args.seed, "years": args.years, "strategies": report}, f, indent=2)
+    return 0
+
+# --- Parameter sweep ---
+SWEEP_CACHE = ".sweep_cache"
+SWEEP_PARAMS = {
+    "starting_capital": int, "pref_bonus": float, "actions_per_week": int, "max_floors": int,
+    "cost_scale": float, "rent_rate": float, "maint_min": int, "maint_div": int,
+    "maint_add": int, "height_rate": float, "ground_maint": int,
+}
+
+def parse_sweep_param(text):
+    # "name=v1,v2,..." (grid values) or "name=lo..hi" (range, --random only)
+    name, _, spec = text.partition("=")
+    if name not in SWEEP_PARAMS or not spec:
+        raise argparse.ArgumentTypeError(
+            f"expected NAME=v1,v2,... or NAME=lo..hi with NAME one of: {', '.join(SWEEP_PARAMS)}")
+    kind = SWEEP_PARAMS[name]
+    try:
+        if ".." in spec:
+            lo, hi = spec.split("..")
+            return name, (kind(lo), kind(hi))
+        return name, [kind(v) for v in spec.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad values for {name}: {spec}")
+
+def sweep_points(params, samples=None, seed=0):
+    # grid: every combination of the listed values; samples: random points
+    names = list(params)
+    if samples is None:
+        if any(isinstance(v, tuple) for v in params.values()):
+            raise SystemExit("ranges (lo..hi) need --random N")
+        points = [{}]
+        for name in names:
+            points = [dict(p, **{name: v}) for p in points for v in params[name]]
+        return points
+    rng = random.Random(seed)
+    points, seen = [], set()
+    for _ in range(samples):
+        p = {}
+        for name in names:
+            v = params[name]
+            if isinstance(v, list):
+                p[name] = rng.choice(v)
+            elif SWEEP_PARAMS[name] is int:
+                p[name] = rng.randint(*v)
+            else:
+                p[name] = round(rng.uniform(*v), 4)
+        key = tuple(p.values())
+        if key not in seen:  # small discrete spaces repeat
+            seen.add(key)
+            points.append(p)
+    return points
+
+def sweep_key(rules, strategy, years, seed):
+    blob = json.dumps({"rules": rules.to_dict(), "strategy": strategy, "years": years, "seed": seed},
+                      sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _sweep_point(task):
+    rules, strategy, years, seed = task
+    rules = Rules.from_dict(rules)
+    caps = array("q")
+    for i in range(years):
+        sim = Simulation(STRATEGIES[strategy](), rng=random.Random(f"{seed}:{i}"), rules=rules)
+        caps.append(sim.run())
+    return summarize(caps)
+
+def run_sweep(args):
+    params = dict(args.param or [])
+    base = DEFAULT_RULES
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            base = Rules.from_dict(json.load(f))
+    points = sweep_points(params, args.random, args.seed)
+
+    os.makedirs(args.cache, exist_ok=True)
+    results, todo = {}, []
+    for i, p in enumerate(points):
+        rules = base.replace(**p)
+        key = sweep_key(rules, args.strategy, args.years, args.seed)
+        path = os.path.join(args.cache, key + ".json")
+        if not args.refresh and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                results[i] = json.load(f)
+        else:
+            todo.append((i, path, (rules.to_dict(), args.strategy, args.years, args.seed)))
+
+    t0 = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for (i, path, _), r in zip(todo, pool.map(_sweep_point, [t for _, _, t in todo])):
+                results[i] = r
+                tmp = path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(r, f)
+                os.replace(tmp, path)
+    elapsed = time.perf_counter() - t0
+
+    order = sorted(results, key=lambda i: -results[i]["mean"])
+    print(f"🎛️ {len(points)} configs x {args.years} years of {args.strategy} in {elapsed:.1f}s"
+          f" ({len(points) - len(todo)} cached)")
+    names = list(params)
+    print("".join(f"{n:>18}" for n in names) + f"{'mean':>10}{'p50':>9}{'bankrupt':>10}")
+    for i in order[:args.top]:
+        r = results[i]
+        print("".join(f"{points[i][n]:>18}" for n in names)
+              + f"{r['mean']:>10.0f}{r['p50']:>9}{r['bankrupt_rate']:>10.2%}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"strategy": args.strategy, "years": args.years, "seed": args.seed,
+                       "base": base.to_dict(),
+                       "results": [dict(points[i], **results[i]) for i in order]}, f, indent=2)
+    return 0
+
+# --- Portfolio ---
+class Portfolio:
+    '''
+    Many towers, each run by a strategy, drawing on one capital pool over
+    several years. Towers are kept from year to year; at each year end a
+    pool at or below BANKRUPT_LIMIT is reset to the starting pool.
+
+    Event-driven: a heap holds (week, kind, tower) for every tower that
+    still acts this year. A tower whose strategy ends its year early gets
+    no more events until the next year, and a full, fully let tower gets
+    none again. The pool is settled in bulk up to each event from the
+    running sum of the towers' weekly nets, so the work grows with the
+    number of events, not towers x weeks.
+    '''
+    YEAR_END, ACT = 0, 1  # a year end sorts before the next year's first actions
+
+    def __init__(self, towers, strategy="build-then-lease", years=1, capital=None, seed=0,
+                 rules=DEFAULT_RULES):
+        self.years = years
+        self.start_capital = rules.starting_capital * towers if capital is None else capital
+        self.capital = self.start_capital
+        self.sims = [Simulation(STRATEGIES[strategy](), 0, rng=random.Random(f"{seed}:{i}"),
+                                tower_name=f"Tower {i + 1}", rules=rules)
+                     for i in range(towers)]
+        self.net = array("q", bytes(8 * towers))  # each tower's weekly net
+        self.total_net = 0   # sum of self.net: what one settled week adds to the pool
+        self.settled = 0     # weeks settled, counted from the start of year 1
+        self.events = 0
+        self.resets = 0
+        self.year_end_capital = []
+        self._dormant = []   # towers done for this year, woken at the year end
+        self._heap = []
+
+    def run(self):
+        heap = self._heap = [(1, self.ACT, i) for i in range(len(self.sims))]
+        heap.append((TOTAL_WEEKS + 1, self.YEAR_END, -1))
+        heapq.heapify(heap)
+        while heap:
+            when, kind, i = heapq.heappop(heap)
+            self.settle(when - 1)
+            if kind == self.YEAR_END:
+                self.year_end(when)
+            else:
+                self.act(i, when)
+        return self.capital
+
+    def settle(self, upto):
+        # every week up to `upto` pays the current total net
+        if upto > self.settled:
+            self.capital += self.total_net * (upto - self.settled)
+            self.settled = upto
+
+    def act(self, i, when):
+        sim = self.sims[i]
+        b = sim.building
+        wk = (when - 1) % TOTAL_WEEKS + 1
+        b.week = wk
+        b.capital = self.capital
+        active = sim.play_week()
+        self.capital = b.capital
+        net = b.weekly_income() - b.weekly_maintenance()
+        self.total_net += net - self.net[i]
+        self.net[i] = net
+        self.events += 1
+
+        if active and wk < TOTAL_WEEKS:
+            heapq.heappush(self._heap, (when + 1, self.ACT, i))
+        elif b.total_floors() < b.max_floors or b.vacancies():
+            self._dormant.append(i)
+        # else full and fully let: accrues in total_net from now on
+
+    def year_end(self, when):
+        self.year_end_capital.append(self.capital)
+        if self.capital <= BANKRUPT_LIMIT:
+            self.capital = self.start_capital
+            self.resets += 1
+        if len(self.year_end_capital) < self.years:
+            for i in self._dormant:
+                heapq.heappush(self._heap, (when, self.ACT, i))
+            self._dormant = []
+            heapq.heappush(self._heap, (when + TOTAL_WEEKS, self.YEAR_END, -1))
+
+    def summary(self):
+        floors = sum(s.building.total_floors() for s in self.sims)
+        empty = sum(s.building.vacancies() for s in self.sims)
+        return {"towers": len(self.sims), "years": self.years, "start_capital": self.start_capital,
+                "capital": self.capital, "year_end_capital": self.year_end_capital,
+                "resets": self.resets, "events": self.events,
+                "tower_weeks": len(self.sims) * self.years * TOTAL_WEEKS,
+                "floors": floors, "empty": empty, "weekly_net": self.total_net}
+
+def run_portfolio(args):
+    rules = DEFAULT_RULES
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            rules = Rules.from_dict(json.load(f))
+    pf = Portfolio(args.towers, args.strategy, args.years, args.capital, args.seed, rules)
+    t0 = time.perf_counter()
+    pf.run()
+    elapsed = time.perf_counter() - t0
+    s = pf.summary()
+
+    print(f"🏙️ {s['towers']} towers x {s['years']} years of {args.strategy} in {elapsed:.1f}s"
+          f" — {s['events']} tower-weeks simulated of {s['tower_weeks']}")
+    for year, cap in enumerate(s["year_end_capital"], 1):
+        print(f"  Year {year:>3}: capital {cap}")
+    print(f"💰 Final capital {s['capital']} (started {s['start_capital']}, {s['resets']} bankruptcy resets)")
+    print(f"🏢 {s['floors']} floors, {s['empty']} empty | weekly net {s['weekly_net']:+}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(s, f, indent=2)
+    return 0
+
+# --- Sandbox ---
+
+def sandbox_tower(floors, path=None, occupancy=0.9, seed=0, max_floors=None):
+    # A tower of `floors` random floors, `occupancy` of them leased, with
+    # build costs waived. Floors live in a FloorStore (memory-mapped at path).
+    rng = random.Random(seed)
+    b = Building(STARTING_CAPITAL, max_floors=max_floors or floors, floors=FloorStore(path))
+    b.tower_name = f"Sandbox x{floors}"
+    b.verbose = False
+    b.keep_logs = False
+    b.draw_window = SANDBOX_WINDOW
+    for fl in range(1, floors + 1):
+        apt_type = APT_TYPES[rng.randrange(len(APT_TYPES))]
+        b.capital += TYPE_BUILD_COST[apt_type]
+        b.add_floor(apt_type)
+        if rng.random() < occupancy:
+            b.assign_tenant(TENANT_POOL[rng.randrange(len(TENANT_POOL))], fl)
+    return b
+
+def run_sandbox(args):
+    t0 = time.perf_counter()
+    b = sandbox_tower(args.floors, args.store, args.occupancy, args.seed)
+    t1 = time.perf_counter()
+    income, maint = b.weekly_income(), b.weekly_maintenance()
+    net = income - maint  # what a week would settle, for --weeks 0
+    for _ in range(args.weeks):
+        income, maint, net = b.settle_week()
+        b.week += 1
+    t2 = time.perf_counter()
+
+    b.week = min(b.week, TOTAL_WEEKS)
+    b.draw()
+    print(f"🏗️  Built {b.total_floors()} floors in {t1 - t0:.2f}s "
+          f"({b.vacancies()} empty)")
+    print(f"📊 {args.weeks} settlements in {(t2 - t1) * 1e6:.0f}µs | "
+          f"Income {income} | Maintenance {maint} | Net {net}")
+    if args.check:
+        b.check_totals()
+        print("✅ Running totals match a full recount")
+    if args.store:
+        b.floors.close()
+        print(f"📁 Floors saved in {os.path.abspath(args.store)}")
+    return 0
+
+# --- Benchmarks ---
+BENCH_SIZES = (10, 100, 10_000, 1_000_000)
+BENCH_OUT = "bench_results.json"
+BENCH_REPEAT = 7        # samples per case (5 for towers over 100k floors)
+
+def _per_op(fn, ops=1, min_time=0.05, setup=None):
+    # one sample of seconds per op: fn looped until min_time has passed, or
+    # with setup, a single fn(setup()) call with only fn timed
+    if setup is not None:
+        arg = setup()
+        t0 = time.perf_counter()
+        fn(arg)
+        return (time.perf_counter() - t0) / ops
+    loops, t0 = 0, time.perf_counter()
+    while True:
+        fn()
+        loops += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            break
+    return elapsed / (loops * ops)
+
+def bench_noise(samples):
+    # relative spread of a case: (median - best) / best; 0 for one sample
+    best, mid = samples[0], samples[len(samples) // 2]
+    return (mid - best) / best if best else 0.0
+
+def _bench_tower(n, leased=True):
+    b = Building(10 ** 15, max_floors=max(n, MAX_FLOORS))
+    b.verbose = False
+    b.keep_logs = False
+    if n > MAX_FLOORS:
+        b.draw_window = SANDBOX_WINDOW
+    for i in range(n):
+        b.add_floor(APT_TYPES[i % len(APT_TYPES)])
+    if leased:
+        for i in range(1, n + 1, 2):
+            b.assign_tenant(TENANT_POOL[i % len(TENANT_POOL)], i)
+    return b
+
+def run_benchmarks(sizes, log_dir):
+    # name -> sorted per-op samples (seconds). Samples are taken round-robin
+    # over the cases, so a slow spell on a shared machine costs every case a
+    # sample or two instead of skewing a whole run of cases.
+    cases = []  # (name, samples wanted, () -> one sample)
+    sinks = []
+    for n in sizes:
+        reps = 5 if n > 100_000 else BENCH_REPEAT
+
+        def build(n=n):
+            _bench_tower(n, leased=False)
+        cases.append((f"add_floor[{n}]", reps, lambda build=build, n=n: _per_op(build, n)))
+
+        # enough fresh towers per sample that short ones are not all jitter
+        towers = max(1, 20_000 // n)
+
+        def lease(fresh, n=n):
+            for tower in fresh:
+                for i in range(1, n + 1):
+                    tower.assign_tenant(TENANT_POOL[i % len(TENANT_POOL)], i)
+
+        def fresh(n=n, towers=towers):
+            return [_bench_tower(n, leased=False) for _ in range(towers)]
+        cases.append((f"assign_tenant[{n}]", reps,
+                      lambda lease=lease, fresh=fresh, ops=n * towers: _per_op(lease, ops, setup=fresh)))
+
+        b = _bench_tower(n)
+        cases.append((f"weekly_maintenance[{n}]", reps, lambda b=b: _per_op(b.weekly_maintenance)))
+
+        def settle(b=b):
+            b.settle_week()
+            b.income_history.clear()
+        cases.append((f"settle_week[{n}]", reps, lambda settle=settle: _per_op(settle)))
+
+        null = open(os.devnull, "w", encoding="utf-8")
+        sinks.append(null)
+        cases.append((f"draw[{n}]", reps, lambda b=b, null=null: _per_op(lambda: b.draw(out=null))))
+
+        b.keep_logs = True
+        b.log_sink = LogSink(os.path.join(log_dir, f"bench_log_{n}.txt"), flush_bytes=1 << 20)
+        b.build_log[1] = [{"floor": f, "type": APT_TYPES[f % 20], "cost": 100} for f in range(1, 8)]
+        sinks.append(b.log_sink)
+        cases.append((f"save_week_log[{n}]", reps,
+                      lambda b=b: _per_op(lambda: b.save_week_log(1, 1000, 900, 100))))
+
+    def year():
+        Simulation(BuildThenLeasePolicy(), rng=random.Random(0)).run()
+    cases.append(("scripted_year", BENCH_REPEAT, lambda: _per_op(year, min_time=0.2)))
+
+    samples = {name: [] for name, _, _ in cases}
+    for rnd in range(BENCH_REPEAT):
+        print(f"  round {rnd + 1}/{BENCH_REPEAT}", end="\r", flush=True)
+        for name, reps, sample in cases:
+            if rnd < reps:
+                samples[name].append(sample())
+    for sink in sinks:
+        sink.close()
+
+    results = {}
+    for name, got in samples.items():
+        results[name] = sorted(got)
+        print(f"  {name:<32}{results[name][0] * 1e6:>14.3f} µs/op  ±{bench_noise(results[name]):.0%}")
+    return results
+
+def compare_benchmarks(results, baseline, threshold):
+    # Names whose best time grew by more than threshold (0.1 = 10%) plus the
+    # noisier run's spread, so jittery cases need a bigger change to count;
+    # the spread counts for at most threshold again, so the allowance never
+    # exceeds twice --threshold. Returns (regressions, name -> allowance).
+    # Old baselines stored one number per case.
+    regressions, allowances = [], {}
+    print(f"\n  {'benchmark':<32}{'baseline':>12}{'now':>12}{'ratio':>8}{'allowed':>9}")
+    for name, samples in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if not isinstance(base, list):
+            base = [base]
+        allowed = threshold + min(threshold, max(bench_noise(base), bench_noise(samples)))
+        allowances[name] = allowed
+        ratio = samples[0] / base[0] if base[0] else float("inf")
+        flag = ""
+        if ratio > 1 + allowed:
+            regressions.append(name)
+            flag = "  ⚠️ regression"
+        elif ratio < 1 - allowed:
+            flag = "  ✅ faster"
+        print(f"  {name:<32}{base[0] * 1e6:>12.3f}{samples[0] * 1e6:>12.3f}{ratio:>8.2f}"
+              f"{allowed:>9.0%}{flag}")
+    return regressions, allowances
+
+def run_bench(args):
+    print(f"⏱️  Benchmarking sizes {', '.join(map(str, args.sizes))}")
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_benchmarks(args.sizes, tmp)
+    report = {
+        "meta": {"python": sys.version.split()[0], "platform": sys.platform,
+                 "date": datetime.now().strftime('%Y-%m-%d %H:%M:%S')},
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📁 Results saved at: {os.path.abspath(args.out)}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions, allowances = compare_benchmarks(results, baseline, args.threshold)
+        if allowances:
+            lo, hi = min(allowances.values()), max(allowances.values())
+            effective = f"{lo:.0%}" if f"{lo:.0%}" == f"{hi:.0%}" else f"{lo:.0%}-{hi:.0%}"
+        else:
+            effective = "n/a, no shared cases"
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%} + noise "
+                  f"(effective threshold {effective}): "
+                  + ", ".join(f"{name} ({allowances[name]:.0%})" for name in regressions))
+            return 1
+        print(f"\n✅ No regressions beyond {args.threshold:.0%} + noise (effective threshold {effective})")
+    return 0
+
+# --- Game server ---
+SERVER_PORT = 9001
+SESSION_LOG_DIR = "sessions"
+SESSION_LINE_MAX = 1024         # longest reply a client may send
+SESSION_WRITE_HIGH = 64 * 1024  # drain() waits once this much output is queued
+
+class SessionLog:
+    '''
+    Game log of one network session. Text is kept in memory; the server
+    appends it to the session's file in a worker thread so the event loop
+    never blocks on disk.
+    '''
+    __slots__ = ("path", "_buf", "pending")
+
+    def __init__(self, path):
+        self.path = path
+        self._buf = []
+        self.pending = 0
+
+    def write(self, text):
+        self._buf.append(text)
+        self.pending += len(text)
+
+    def take(self):
+        data = "".join(self._buf).encode("utf-8")
+        self._buf = []
+        self.pending = 0
+        return data
+
+def _append_file(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+
+class GameSession:
+    '''
+    One connection playing game_steps() with its own Building, RNG, log and
+    GameRecord (appended to the server's game_records.jsonl at the end).
+    The game runs synchronously up to its next prompt with print() redirected
+    to this session, then the session awaits the client's reply.
+    '''
+    __slots__ = ("server", "reader", "writer", "record", "out", "log", "steps")
+
+    def __init__(self, server, sid, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        seed = None if server.seed is None else server.seed + sid
+        self.record = GameRecord(seed, server.auto_lease)
+        self.out = io.StringIO()
+        self.log = SessionLog(os.path.join(server.log_dir, f"session-{sid}.txt"))
+        self.steps = game_steps(auto_lease=server.auto_lease, log_sink=self.log,
+                                rng=random.Random(self.record.seed), record=self.record)
+
+    def advance(self, reply=None):
+        # run the game to its next prompt; None once it has finished or quit
+        with redirect_stdout(self.out):
+            try:
+                if reply is None:
+                    return next(self.steps)
+                self.record.replies.append(reply)
+                return self.steps.send(reply)
+            except (StopIteration, SystemExit):
+                return None
+
+    async def send(self, prompt=""):
+        text = self.out.getvalue() + prompt
+        self.out.seek(0)
+        self.out.truncate()
+        self.writer.write(text.encode("utf-8"))
+        # backpressure: a client that stops reading is dropped, not buffered forever
+        await asyncio.wait_for(self.writer.drain(), self.server.write_timeout)
+
+    async def flush_log(self):
+        if self.log.pending:
+            await asyncio.to_thread(_append_file, self.log.path, self.log.take())
+
+    async def run(self):
+        try:
+            prompt = self.advance()
+            while prompt is not None:
+                await self.send(prompt)
+                try:
+                    line = await asyncio.wait_for(self.reader.readline(), self.server.idle_timeout)
+                except ValueError:  # longer than SESSION_LINE_MAX
+                    self.out.write("\n❌ Input too long. Disconnecting.\n")
+                    break
+                if not line:  # client hung up
+                    break
+                prompt = self.advance(line.decode("utf-8", "replace").rstrip("\r\n"))
+                if self.log.pending >= self.server.log_flush_bytes:
+                    await self.flush_log()
+            await self.send()
+        finally:
+            self.steps.close()
+            # the tail of the log and the session's record: small, written directly
+            if self.log.pending:
+                _append_file(self.log.path, self.log.take())
+            if self.record.replies:
+                self.record.save(os.path.join(self.server.log_dir, RECORD_PATH))
+
+class GameServer:
+    '''
+    Line-based TCP server: every connection gets its own game session.
+    At most max_sessions play at once; further connections are turned away.
+    '''
+    def __init__(self, host="127.0.0.1", port=SERVER_PORT, max_sessions=1000,
+                 idle_timeout=600.0, write_timeout=30.0, auto_lease=False, seed=None,
+                 log_dir=SESSION_LOG_DIR, log_flush_bytes=16 * 1024):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.write_timeout = write_timeout
+        self.auto_lease = auto_lease
+        self.seed = seed
+        self.log_dir = log_dir
+        self.log_flush_bytes = log_flush_bytes
+        self.active = 0
+        self.served = 0
+        self._slots = None  # asyncio.Semaphore, made inside the running loop
+
+    async def handle(self, reader, writer):
+        if self._slots.locked():
+            if METRICS is not None:
+                METRICS.incr("server.rejected")
+            writer.write("🚧 Server full, try again later.\n".encode("utf-8"))
+            writer.close()
+            return
+        async with self._slots:
+            self.served += 1
+            self.active += 1
+            if METRICS is not None:
+                METRICS.incr("server.sessions")
+            writer.transport.set_write_buffer_limits(high=SESSION_WRITE_HIGH)
+            try:
+                await GameSession(self, self.served, reader, writer).run()
+            except (asyncio.TimeoutError, ConnectionError):
+                pass  # idle, too slow to read, or gone
+            finally:
+                self.active -= 1
+                writer.close()
+
+    async def serve(self, ready=None):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._slots = asyncio.Semaphore(self.max_sessions)
+        server = await asyncio.start_server(self.handle, self.host, self.port,
+                                            limit=SESSION_LINE_MAX)
+        self.port = server.sockets[0].getsockname()[1]  # port 0 picks a free one
+        if ready:
+            ready(self)
+        async with server:
+            await server.serve_forever()
+
+def run_server(args):
+    gs = GameServer(args.host, args.port, args.max_sessions, args.idle_timeout,
+                    auto_lease=args.auto_lease, seed=args.seed, log_dir=args.log_dir)
+    ready = lambda s: print(f"🏢 100APT server on {s.host}:{s.port} "
+                            f"(max {s.max_sessions} sessions, logs in {s.log_dir}/)")
+    try:
+        asyncio.run(gs.serve(ready))
+    except KeyboardInterrupt:
+        print(f"\n👋 Server stopped after {gs.served} sessions.")
+    return 0
+
+# --- Record / replay ---
+RECORD_PATH = "game_records.jsonl"
+RECORD_VERSION = 1
+
+class GameRecord:
+    '''
+    Seed and every reply of one session (menu choices, offer picks,
+    cancellations, floor numbers, y/n answers) plus the capital trajectory of
+    each finished year. Sending the replies back into game_steps() with
+    Random(seed) replays the session exactly (replay_record).
+    '''
+    def __init__(self, seed=None, auto_lease=False, max_floors=None, rules=None):
+        self.seed = random.SystemRandom().randrange(2**63) if seed is None else seed
+        self.auto_lease = auto_lease
+        self.max_floors = max_floors
+        self.rules = rules  # Rules.to_dict(), or None for the defaults
+        self.replies = []
+        self.years = []
+
+    def year_done(self, b):
+        self.years.append({"tower": b.tower_name, "start_capital": b.start_capital,
+                           "income_history": list(b.income_history)})
+
+    def to_dict(self, pending=()):
+        # pending: replies the resumed game will never be asked for (see play_steps)
+        return {"version": RECORD_VERSION, "seed": self.seed, "auto_lease": self.auto_lease,
+                "max_floors": self.max_floors, "rules": self.rules,
+                "replies": self.replies + list(pending),
+                "years": self.years}
+
+    def load(self, d):
+        if d.get("version") != RECORD_VERSION:
+            raise ValueError(f"unsupported record version {d.get('version')}")
+        self.seed = d["seed"]
+        self.auto_lease = d["auto_lease"]
+        self.max_floors = d["max_floors"]
+        self.rules = d.get("rules")
+        self.replies = list(d["replies"])
+        self.years = list(d["years"])
+        return self
+
+    def save(self, path=RECORD_PATH):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.to_dict(), separators=(",", ":")) + "\n")
+
+    @classmethod
+    def load_all(cls, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield cls().load(json.loads(line))
+
+def replay_record(rec, log_sink=None):
+    # Runs the recorded replies through game_steps() with no rendering and no
+    # output. The returned record holds the replies consumed and the replayed years.
+    got = GameRecord(rec.seed, rec.auto_lease, rec.max_floors, rec.rules)
+    steps = game_steps(auto_lease=rec.auto_lease, max_floors=rec.max_floors,
+                       rules=Rules.from_dict(rec.rules) if rec.rules else DEFAULT_RULES,
+                       log_sink=log_sink or SessionLog(None), rng=random.Random(rec.seed),
+                       record=got, quiet=True)
+    with open(os.devnull, "w", encoding="utf-8") as null, redirect_stdout(null):
+        try:
+            next(steps)
+            for reply in rec.replies:
+                got.replies.append(reply)
+                steps.send(reply)
+        except (StopIteration, SystemExit):
+            pass
+        finally:
+            steps.close()
+    return got
+
+def first_difference(rec, got):
+    # (year, week) where a replay leaves the recorded trajectory, or None
+    for y, (a, b) in enumerate(zip(rec.years, got.years), 1):
+        a, b = a["income_history"], b["income_history"]
+        for w, (x, z) in enumerate(zip(a, b), 1):
+            if x != z:
+                return y, w
+        if len(a) != len(b):
+            return y, min(len(a), len(b)) + 1
+    if len(rec.years) != len(got.years) or len(rec.replies) != len(got.replies):
+        return min(len(rec.years), len(got.years)) + 1, 0
+    return None
 
-            # Capital carry-over logic
-            # if the player is bankrupt, reset capital
-            print("Preparing your next building...")
-            print("🎉 Your new building awaits!\n")
+def run_replay(args):
+    records = [rec for path in args.files for rec in GameRecord.load_all(path)]
+    sink = SessionLog(args.log) if args.log else None
+    differ = 0
+    t0 = time.perf_counter()
+    for i, rec in enumerate(records, 1):
+        got = replay_record(rec, sink)
+        if sink and sink.pending:
+            _append_file(sink.path, sink.take())
+        finals = [y["income_history"][-1] if y["income_history"] else y["start_capital"]
+                  for y in got.years]
+        diff = first_difference(rec, got)
+        if diff is None:
+            status = "✅ matches"
+        else:
+            differ += 1
+            status = f"❌ differs from year {diff[0]}" + (f" week {diff[1]}" if diff[1] else "")
+        if diff is not None or not args.quiet:
+            print(f"  #{i} seed {rec.seed}: {len(got.years)} years, year-end capital {finals} {status}")
+    dt = time.perf_counter() - t0
+    print(f"\n🔁 Replayed {len(records)} games in {dt:.2f}s — {len(records) - differ} match, {differ} differ")
+    return 1 if differ and args.check else 0
+
+# --- Log analyzer ---
+# Parses the free-text game_log.txt format written by format_week_log().
+# Lines are handled as bytes; only names and themes are decoded.
+RUN_MARK = ("\n" + "=" * 50 + "\n🏢 Building: ").encode("utf-8")  # blank line before a run header
+ANALYZE_CHUNK = 16 * 1024 * 1024  # about this many bytes per parallel task
+_L_BUILDING = "🏢 Building: ".encode("utf-8")
+_L_DATE = "📅 Date: ".encode("utf-8")
+_L_START = "💵 Starting Capital: ".encode("utf-8")
+_TENANT_PREF = {t.name.encode("utf-8"): t.pref_id for t in TENANT_POOL}
+_THEME_ID = {t.encode("utf-8"): i for i, t in enumerate(APT_TYPES)}
+
+class RunStats:
+    # one run of the log, filled in line by line by LogStats.feed()
+    __slots__ = ("name", "date", "start_capital", "capital", "nets", "built",
+                 "placed", "matched", "floor_type")
+
+    def __init__(self, name=None, date=None, start_capital=None):
+        self.name = name  # None: weeks with no header (log rotated mid-run, or a resumed game)
+        self.date = date
+        self.start_capital = start_capital
+        self.capital = start_capital
+        self.nets = array("q")
+        self.built = {}        # theme (bytes) -> floors built
+        self.placed = 0
+        self.matched = 0       # placements on the tenant's preferred theme
+        self.floor_type = {}   # floor -> type id, for the preference check
+
+    def summary(self):
+        return {"tower": self.name, "date": self.date, "start_capital": self.start_capital,
+                "final_capital": self.capital, "weeks": len(self.nets),
+                "built": {t.decode("utf-8", "replace"): n for t, n in self.built.items()},
+                "placements": self.placed,
+                "pref_match_rate": self.matched / self.placed if self.placed else None,
+                "net": list(self.nets)}
+
+class LogStats:
+    '''
+    Running totals over the runs of one or more logs. feed() takes byte lines
+    and keeps only the run in progress; each finished run is added to the
+    totals and its summary() passed to on_run. Stats from separately parsed
+    parts of a log merge() in order.
+    '''
+    def __init__(self, on_run=None):
+        self.on_run = on_run
+        self.runs = 0
+        self.weeks = 0
+        self.bankrupt = 0
+        self.final_sum = 0
+        self.final_min = None
+        self.final_max = None
+        self.built = {}
+        self.placed = 0
+        self.matched = 0
+        self.net_sum = array("q")    # by week index
+        self.net_count = array("q")
+        self.run = None
+        self._section = None
+
+    def feed(self, lines):
+        run = self.run
+        section = self._section
+        for line in lines:
+            head = line[:1]
+            if head == b"\n":
+                continue
+            if head == b" ":
+                if section == 1 and line.startswith(b" Built Floor "):
+                    floor, rest = line[13:].split(b" ", 1)
+                    theme = rest.rsplit(b" (Cost ", 1)[0]
+                    run.built[theme] = run.built.get(theme, 0) + 1
+                    run.floor_type[int(floor)] = _THEME_ID.get(theme, -2)
+                elif section == 2 and b" -> Floor " in line:
+                    name, floor = line[1:].rsplit(b" -> Floor ", 1)
+                    run.placed += 1
+                    pref = _TENANT_PREF.get(name, -1)
+                    if pref >= 0 and run.floor_type.get(int(floor)) == pref:
+                        run.matched += 1
+            elif head == b"I" and line.startswith(b"Income: "):
+                # Income: a, Maintenance: b, Net: c, Capital: d
+                if run is None:
+                    run = self.run = RunStats()
+                fields = line.split(b", ")
+                run.nets.append(int(fields[2][5:]))
+                run.capital = int(fields[3][9:])
+            elif head == b"[":
+                section = 1 if line.startswith(b"[Build Log]") else 2 if line.startswith(b"[Move-in Log]") else None
+            elif head == b"=":
+                if line.startswith(b"===== Week "):
+                    section = None
+                    if run is None:
+                        run = self.run = RunStats()
+            elif line.startswith(_L_BUILDING):
+                self.end_run()
+                section = None
+                run = self.run = RunStats(line[len(_L_BUILDING):].rstrip(b"\r\n").decode("utf-8", "replace"))
+            elif line.startswith(_L_DATE) and run is not None:
+                run.date = line[len(_L_DATE):].strip().decode("ascii", "replace")
+            elif line.startswith(_L_START) and run is not None:
+                run.start_capital = run.capital = int(line[len(_L_START):])
+        self._section = section
+
+    def end_run(self):
+        run, self.run = self.run, None
+        if run is None:
+            return
+        self.runs += 1
+        self.weeks += len(run.nets)
+        cap = run.capital
+        if cap is not None:
+            self.final_sum += cap
+            self.final_min = cap if self.final_min is None else min(self.final_min, cap)
+            self.final_max = cap if self.final_max is None else max(self.final_max, cap)
+            if cap <= BANKRUPT_LIMIT:
+                self.bankrupt += 1
+        for theme, n in run.built.items():
+            theme = theme.decode("utf-8", "replace")
+            self.built[theme] = self.built.get(theme, 0) + n
+        self.placed += run.placed
+        self.matched += run.matched
+        for i, net in enumerate(run.nets):
+            if i == len(self.net_sum):
+                self.net_sum.append(0)
+                self.net_count.append(0)
+            self.net_sum[i] += net
+            self.net_count[i] += 1
+        if self.on_run:
+            self.on_run(run.summary())
+
+    def merge(self, other):
+        self.runs += other.runs
+        self.weeks += other.weeks
+        self.bankrupt += other.bankrupt
+        self.final_sum += other.final_sum
+        for v in (other.final_min, other.final_max):
+            if v is not None:
+                self.final_min = v if self.final_min is None else min(self.final_min, v)
+                self.final_max = v if self.final_max is None else max(self.final_max, v)
+        for theme, n in other.built.items():
+            self.built[theme] = self.built.get(theme, 0) + n
+        self.placed += other.placed
+        self.matched += other.matched
+        for i in range(len(other.net_sum)):
+            if i == len(self.net_sum):
+                self.net_sum.append(0)
+                self.net_count.append(0)
+            self.net_sum[i] += other.net_sum[i]
+            self.net_count[i] += other.net_count[i]
+
+    def summary(self):
+        return {"runs": self.runs, "weeks": self.weeks, "bankrupt": self.bankrupt,
+                "final_capital": {"mean": self.final_sum / self.runs if self.runs else None,
+                                  "min": self.final_min, "max": self.final_max},
+                "built": dict(sorted(self.built.items(), key=lambda kv: -kv[1])),
+                "placements": self.placed,
+                "pref_match_rate": self.matched / self.placed if self.placed else None,
+                "mean_net_by_week": [s / c for s, c in zip(self.net_sum, self.net_count)]}
+
+def log_lines(path, start=0, end=None):
+    # byte lines of path[start:end]; .gz files are streamed whole
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from f
+        return
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm) if end is None else end
+            mm.seek(start)
+            readline = mm.readline
+            while mm.tell() < end:
+                yield readline()
+
+def log_splits(path, parts):
+    # byte offsets that cut path into about `parts` pieces, each starting at a run header
+    size = os.path.getsize(path)
+    cuts = [0]
+    if parts > 1 and size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, parts):
+                pos = mm.find(RUN_MARK, max(cuts[-1], size * i // parts))
+                if pos < 0:
+                    break
+                if pos + 1 > cuts[-1]:
+                    cuts.append(pos + 1)
+    cuts.append(size)
+    return list(zip(cuts, cuts[1:]))
+
+def _analyze_part(task):
+    path, start, end, keep_runs = task
+    runs = []
+    stats = LogStats(on_run=runs.append if keep_runs else None)
+    stats.feed(log_lines(path, start, end))
+    stats.end_run()
+    stats.on_run = None  # runs go back separately
+    return stats, runs
+
+def analyze_logs(paths, workers=None, on_run=None):
+    # Small files and .gz files are parsed here, streaming; big plain logs
+    # are cut at run headers and parsed in worker processes.
+    workers = workers or os.cpu_count() or 1
+    total = LogStats(on_run)
+    tasks = []
+    for path in paths:
+        size = 0 if path.endswith(".gz") else os.path.getsize(path)
+        parts = min(workers * 4, size // ANALYZE_CHUNK)
+        if workers > 1 and parts > 1:
+            tasks += [(path, start, end, on_run is not None) for start, end in log_splits(path, parts)]
+        else:
+            total.feed(log_lines(path))
+            total.end_run()
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for stats, runs in pool.map(_analyze_part, tasks):
+                total.merge(stats)
+                for r in runs:
+                    on_run(r)
+    return total
+
+def run_analyze(args):
+    out = open(args.runs, "w", encoding="utf-8") if args.runs else None
+    on_run = None
+    if out:
+        def on_run(r):
+            out.write(json.dumps(r, ensure_ascii=False) + "\n")
+    t0 = time.perf_counter()
+    try:
+        stats = analyze_logs(args.files, args.workers, on_run)
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    s = stats.summary()
+    mb = sum(os.path.getsize(p) for p in args.files) / 1e6
+
+    print(f"📊 {s['runs']} runs, {s['weeks']} weeks from {mb:.1f} MB in {elapsed:.1f}s")
+    if s["runs"]:
+        fc = s["final_capital"]
+        print(f"💰 Final capital: mean {fc['mean']:.0f}, min {fc['min']}, max {fc['max']}"
+              f" | bankrupt {s['bankrupt']} ({s['bankrupt'] / s['runs']:.1%})")
+    print("🏗️ Floors built: " + (", ".join(f"{t} {n}" for t, n in s["built"].items()) or "none"))
+    rate = s["pref_match_rate"]
+    print(f"🧑 Tenant placements: {s['placements']}"
+          + (f" ({rate:.1%} on their preferred theme)" if rate is not None else ""))
+    curve = s["mean_net_by_week"]
+    if curve:
+        marks = sorted({0, len(curve) // 4, len(curve) // 2, 3 * len(curve) // 4, len(curve) - 1})
+        print("📈 Mean weekly net: " + ", ".join(f"wk {i + 1}: {curve[i]:.0f}" for i in marks))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(s, f, indent=2, ensure_ascii=False)
+    return 0
+
+# --- Instrumentation ---
+# Off unless APT_METRICS=1 or --metrics. enable_metrics() swaps timed wrappers
+# in for the hot functions, so a normal game runs the plain, unwrapped code.
+METRICS = None
+
+class Metrics:
+    def __init__(self):
+        self.calls = {}     # name -> [count, seconds]
+        self.events = {}    # name -> count
+        self.observed = {}  # name -> [count, sum, min, max]
+        self._lock = threading.Lock()  # LogSink flushes from its own thread
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.events[name] = self.events.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self._lock:
+            o = self.observed.get(name)
+            if o is None:
+                self.observed[name] = [1, value, value, value]
+            else:
+                o[0] += 1
+                o[1] += value
+                o[2] = min(o[2], value)
+                o[3] = max(o[3], value)
+
+    def timed(self, name, fn):
+        calls = self.calls.setdefault(name, [0, 0.0])
+        lock = self._lock
+        perf = time.perf_counter
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = perf()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                dt = perf() - t0
+                with lock:
+                    calls[0] += 1
+                    calls[1] += dt
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": {k: {"count": c, "seconds": s} for k, (c, s) in self.calls.items() if c},
+                "events": dict(self.events),
+                "observed": {k: {"count": c, "sum": t, "min": lo, "max": hi, "mean": t / c}
+                             for k, (c, t, lo, hi) in self.observed.items()},
+            }
+
+    def prometheus(self):
+        snap = self.snapshot()
+        lines = ["# TYPE apt_calls_total counter"]
+        lines += [f'apt_calls_total{{name="{k}"}} {v["count"]}' for k, v in snap["calls"].items()]
+        lines.append("# TYPE apt_seconds_total counter")
+        lines += [f'apt_seconds_total{{name="{k}"}} {v["seconds"]:.9f}' for k, v in snap["calls"].items()]
+        lines.append("# TYPE apt_events_total counter")
+        lines += [f'apt_events_total{{name="{k}"}} {v}' for k, v in snap["events"].items()]
+        lines.append("# TYPE apt_observed summary")
+        for k, v in snap["observed"].items():
+            lines.append(f'apt_observed_count{{name="{k}"}} {v["count"]}')
+            lines.append(f'apt_observed_sum{{name="{k}"}} {v["sum"]}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        snap = self.snapshot()
+        lines = ["", "📊 Session metrics"]
+        for k, v in sorted(snap["calls"].items(), key=lambda kv: -kv[1]["seconds"]):
+            lines.append(f"  {k:<30}{v['count']:>9} calls{v['seconds'] * 1000:>12.2f} ms")
+        for k, v in sorted(snap["events"].items()):
+            lines.append(f"  {k:<30}{v:>9}")
+        for k, v in sorted(snap["observed"].items()):
+            lines.append(f"  {k:<30} mean {v['mean']:.2f} (min {v['min']}, max {v['max']}, n={v['count']})")
+        return "\n".join(lines)
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+
+def enable_metrics(out=None):
+    global METRICS
+    if METRICS is not None:
+        return METRICS
+    m = METRICS = Metrics()
+    g = globals()
+
+    for name in ("add_floor", "assign_tenant", "weekly_maintenance", "settle_week",
+                 "fast_forward", "draw", "save_week_log"):
+        setattr(Building, name, m.timed(f"building.{name}", getattr(Building, name)))
+    LogSink.flush = m.timed("log.flush", LogSink.flush)
+    save = g["save_snapshot"]
+    g["save_snapshot"] = m.timed("play.autosave", save)
+
+    # every terminal prompt goes through input() in run_prompts; shadow the builtin for this module
+    g["input"] = m.timed("play.input", input)
+
+    def counted(kind, fn):
+        # the choosers are prompt generators, so count them instead of timing
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            m.incr(f"play.{fn.__name__}")
+            result = yield from fn(*args, **kwargs)
+            if result == "FORCE_SPEND":
+                m.incr(f"play.forced_spend.{kind}")
+            return result
+        return wrapper
+    g["choose_build"] = counted("build", choose_build)
+    g["choose_tenant"] = counted("tenant", choose_tenant)
+
+    def report():
+        print(m.summary(), file=sys.stderr)
+        if out:
+            m.export(out)
+    atexit.register(report)
+    return m
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="100APT — Apartment Builder Simulator")
+    ap.add_argument("--run-log", metavar="PATH",
+                    help="also write a structured run log (index at PATH.idx)")
+    ap.add_argument("--run-log-format", choices=("bin", "jsonl"), default="bin")
+    ap.add_argument("--auto-lease", action="store_true",
+                    help="place tenants automatically on the best-paying empty floor")
+    ap.add_argument("--advisor", action="store_true",
+                    help="show the strategy solver's recommendation at every choice")
+    ap.add_argument("--forecast", action="store_true",
+                    help="show each offer's projected year-end capital and payback week")
+    ap.add_argument("--diff-draw", action="store_true",
+                    help="keep the tower pinned at the top of the terminal, redrawing only what changed")
+    ap.add_argument("--max-floors", type=int, default=None, metavar="N",
+                    help=f"floor limit per tower (default {MAX_FLOORS}; sandbox play)")
+    ap.add_argument("--rules", metavar="PATH",
+                    help="play under other balance constants (JSON object of Rules fields)")
+    ap.add_argument("--floor-store", metavar="PATH",
+                    help="keep floors in a memory-mapped store at PATH instead of in memory")
+    ap.add_argument("--resume", nargs="?", const=SAVE_PATH, metavar="PATH",
+                    help=f"continue a saved game (default {SAVE_PATH})")
+    ap.add_argument("--save", default=SAVE_PATH, metavar="PATH",
+                    help="autosave file, written at every week boundary")
+    ap.add_argument("--no-autosave", action="store_true")
+    ap.add_argument("--record", default=RECORD_PATH, metavar="PATH",
+                    help=f"append the session's seed and replies here for replay (default {RECORD_PATH})")
+    ap.add_argument("--metrics", action="store_true",
+                    help="time prompts, settlement, rendering and log I/O (also APT_METRICS=1)")
+    ap.add_argument("--metrics-out", metavar="PATH",
+                    help="write the metrics at exit (.prom for Prometheus text, else JSON)")
+    sub = ap.add_subparsers(dest="command")
+
+    tp = sub.add_parser("tournament", help="compare strategies over many simulated years")
+    tp.add_argument("-n", "--years", type=int, default=10_000, help="years per strategy")
+    tp.add_argument("-s", "--strategies", nargs="+", metavar="NAME",
+                    help=f"subset of: {', '.join(STRATEGIES)} (default: all but solver)")
+    tp.add_argument("--seed", type=int, default=0)
+    tp.add_argument("-j", "--workers", type=int, default=None, help="processes (default: all cores)")
+    tp.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    tp.set_defaults(func=run_tournament)
+
+    wp = sub.add_parser("sweep", help="search balance constants with a simulated strategy")
+    wp.add_argument("-p", "--param", type=parse_sweep_param, action="append", metavar="NAME=VALUES",
+                    help="values to try: NAME=v1,v2,... or NAME=lo..hi (with --random); repeatable")
+    wp.add_argument("--random", type=int, metavar="N", help="sample N random configs instead of the grid")
+    wp.add_argument("-s", "--strategy", default="build-then-lease", choices=list(STRATEGIES))
+    wp.add_argument("-n", "--years", type=int, default=500, help="simulated years per config")
+    wp.add_argument("--seed", type=int, default=0)
+    wp.add_argument("--rules", metavar="PATH", help="base rules (JSON) the params are applied to")
+    wp.add_argument("-j", "--workers", type=int, default=None, help="processes (default: all cores)")
+    wp.add_argument("--cache", default=SWEEP_CACHE, help=f"result cache directory (default {SWEEP_CACHE})")
+    wp.add_argument("--refresh", action="store_true", help="recompute cached configs")
+    wp.add_argument("--top", type=int, default=20, help="configs to list")
+    wp.add_argument("--json", metavar="PATH", help="also write every result as JSON")
+    wp.set_defaults(func=run_sweep)
+
+    pp = sub.add_parser("portfolio", help="many towers sharing one capital pool over several years")
+    pp.add_argument("-t", "--towers", type=int, default=1000)
+    pp.add_argument("-y", "--years", type=int, default=10)
+    pp.add_argument("-s", "--strategy", default="build-then-lease",
+                    choices=[name for name in STRATEGIES if name != "solver"])  # solver: one tower at a time
+    pp.add_argument("--capital", type=int, default=None,
+                    help="starting pool (default: starting capital x towers)")
+    pp.add_argument("--seed", type=int, default=0)
+    pp.add_argument("--rules", metavar="PATH", help="balance constants (JSON)")
+    pp.add_argument("--json", metavar="PATH", help="also write the summary as JSON")
+    pp.set_defaults(func=run_portfolio)
+
+    sp = sub.add_parser("sandbox", help="build and settle one very tall tower")
+    sp.add_argument("-f", "--floors", type=int, default=100_000)
+    sp.add_argument("--store", metavar="PATH", help="memory-map the floors from PATH")
+    sp.add_argument("--occupancy", type=float, default=0.9)
+    sp.add_argument("--weeks", type=int, default=TOTAL_WEEKS, help="settlements to time")
+    sp.add_argument("--seed", type=int, default=0)
+    sp.add_argument("--check", action="store_true", help="verify the running totals afterwards")
+    sp.set_defaults(func=run_sandbox)
+
+    bp = sub.add_parser("bench", help="time the Building hot paths")
+    bp.add_argument("--sizes", type=int, nargs="+", default=list(BENCH_SIZES), metavar="N",
+                    help="tower heights to benchmark")
+    bp.add_argument("-o", "--out", default=BENCH_OUT, help=f"results file (default {BENCH_OUT})")
+    bp.add_argument("--compare", metavar="BASELINE", help="earlier results file to compare against")
+    bp.add_argument("--threshold", type=float, default=0.10,
+                    help="slowdown ratio flagged as a regression, on top of each "
+                         "case's measured noise, itself capped at this value (default 0.10)")
+    bp.set_defaults(func=run_bench)
+
+    gp = sub.add_parser("serve", help="host many games over TCP (one per connection)")
+    gp.add_argument("--host", default="127.0.0.1")
+    gp.add_argument("-p", "--port", type=int, default=SERVER_PORT)
+    gp.add_argument("--max-sessions", type=int, default=1000, metavar="N",
+                    help="concurrent games; extra connections are turned away")
+    gp.add_argument("--idle-timeout", type=float, default=600.0, metavar="SECONDS",
+                    help="drop a player who has not answered for this long")
+    gp.add_argument("--auto-lease", action="store_true")
+    gp.add_argument("--seed", type=int, default=None,
+                    help="session N plays with Random(seed + N) (default: unseeded)")
+    gp.add_argument("--log-dir", default=SESSION_LOG_DIR,
+                    help=f"per-session game logs (default {SESSION_LOG_DIR}/)")
+    gp.set_defaults(func=run_server)
+
+    rp = sub.add_parser("replay", help="re-run recorded games without rendering")
+    rp.add_argument("files", nargs="+", metavar="RECORDS", help=f"record files ({RECORD_PATH})")
+    rp.add_argument("--check", action="store_true",
+                    help="exit non-zero if any replay leaves its recorded capital trajectory")
+    rp.add_argument("--log", metavar="PATH", help="write the replayed game logs here")
+    rp.add_argument("-q", "--quiet", action="store_true", help="only list games that differ")
+    rp.set_defaults(func=run_replay)
+
+    lp = sub.add_parser("analyze", help="summarize the runs in game_log.txt (and rotated .gz logs)")
+    lp.add_argument("files", nargs="*", default=[LOG_PATH], metavar="LOG",
+                    help=f"log files, plain or .gz (default {LOG_PATH})")
+    lp.add_argument("-j", "--workers", type=int, default=None,
+                    help="processes for large plain logs (default: all cores)")
+    lp.add_argument("--runs", metavar="PATH", help="write one JSON line per run")
+    lp.add_argument("--json", metavar="PATH", help="also write the totals as JSON")
+    lp.set_defaults(func=run_analyze)
+    return ap.parse_args(argv)
 
+if __name__ == "__main__":
+    args = parse_args()
+    if args.metrics or args.metrics_out or os.environ.get("APT_METRICS") == "1":
+        enable_metrics(args.metrics_out or os.environ.get("APT_METRICS_OUT"))
+    if args.command:
+        sys.exit(args.func(args))
+    run_log = RunLog(args.run_log, args.run_log_format) if args.run_log else None
+    autosave = None if args.no_autosave else args.save
+    rules = DEFAULT_RULES
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            rules = Rules.from_dict(json.load(f))
+    record = GameRecord(auto_lease=args.auto_lease, max_floors=args.max_floors,
+                        rules=None if rules.is_default() else rules.to_dict())
+    rng = random.Random(record.seed)
+    try:
+        resumed = load_snapshot(args.resume, rng, record) if args.resume else None
+        advisor = Advisor() if args.advisor else None
+        if args.forecast:
+            advisor = Forecaster(advisor)
+        # a resumed game keeps the flags it was recorded with
+        run_prompts(game_steps(run_log=run_log, auto_lease=record.auto_lease, advisor=advisor,
+                               max_floors=record.max_floors, floor_store=args.floor_store,
+                               resume=resumed, autosave=autosave, rng=rng, record=record,
+                               rules=rules, diff_draw=args.diff_draw),
+                    record)
+        sys.exit(0)
     except KeyboardInterrupt:
         print("\nExit"); sys.exit(0)
+    finally:
+        if record.replies:
+            record.save(args.record)
 
@@ -0,0 +1,29 @@
+# 100APT.py is not an importable module name, so load it by path
+import importlib.util
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_game():
+    spec = importlib.util.spec_from_file_location("apt", os.path.join(ROOT, "100APT.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def apt():
+    return load_game()
+
+
+@pytest.fixture
+def quiet_building(apt):
+    # Building factory with console messages off
+    def make(*args, **kwargs):
+        b = apt.Building(*args, **kwargs)
+        b.verbose = False
+        return b
+    return make
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import random
+import sys
+from collections import Counter
+
+import pytest
+
+
+def logged_towers(apt, path, count):
+    # simulated years appended to one free-text log, as game_log.txt gets them
+    policies = [apt.BuildThenLeasePolicy, apt.PrefLeasePolicy, apt.RandomPolicy]
+    towers = []
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        for i in range(count):
+            sim = apt.Simulation(policies[i % 3](), rng=random.Random(i), tower_name=f"Tower {i}", log=True)
+            sim.building.log_sink = f
+            sim.run()
+            towers.append(sim.building)
+    return towers
+
+
+def expected_nets(b):
+    # weekly net = capital change plus what was spent building that week
+    nets, previous = [], b.start_capital
+    for week, capital in enumerate(b.income_history, 1):
+        spent = sum(r["cost"] for r in b.build_log.get(week, []))
+        nets.append(capital - previous + spent)
+        previous = capital
+    return nets
+
+
+def test_split_totals_match_the_towers(apt, tmp_path, monkeypatch):
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("workers find 100APT.py by module name only when forked")
+    monkeypatch.setitem(sys.modules, "apt", apt)  # so _analyze_part pickles
+    monkeypatch.setattr(apt, "ANALYZE_CHUNK", 16 * 1024)
+
+    path = str(tmp_path / "game_log.txt")
+    towers = logged_towers(apt, path, 24)
+    assert os.path.getsize(path) // apt.ANALYZE_CHUNK > 8  # big enough to go to the workers
+    splits = apt.log_splits(path, 8)
+    assert len(splits) > 2
+    with open(path, "rb") as f:
+        for start, _ in splits[1:]:
+            f.seek(start)
+            assert f.read(len(apt.RUN_MARK) - 1) == apt.RUN_MARK[1:]
+
+    runs = []
+    stats = apt.analyze_logs([path], workers=2, on_run=runs.append)
+    s = stats.summary()
+    assert [r["tower"] for r in runs] == [b.tower_name for b in towers]
+    assert [r["net"] for r in runs] == [expected_nets(b) for b in towers]
+    assert s["runs"] == len(towers)
+    assert s["weeks"] == sum(len(b.income_history) for b in towers)
+    finals = [b.capital for b in towers]
+    assert s["final_capital"] == {"mean": sum(finals) / len(finals), "min": min(finals), "max": max(finals)}
+    assert s["bankrupt"] == sum(c <= apt.BANKRUPT_LIMIT for c in finals)
+
+    built = Counter(r["type"] for b in towers for recs in b.build_log.values() for r in recs)
+    assert s["built"] == dict(built)
+    moveins = [(b, r) for b in towers for recs in b.movein_log.values() for r in recs]
+    prefs = dict(apt.TENANTS)
+    matched = sum(prefs[r["tenant"]] == b.floors[r["floor"] - 1].apt_type for b, r in moveins)
+    assert s["placements"] == len(moveins)
+    assert stats.matched == matched
+
+    net_sum = [0] * apt.TOTAL_WEEKS
+    for b in towers:
+        for i, net in enumerate(expected_nets(b)):
+            net_sum[i] += net
+    assert list(stats.net_sum) == net_sum
+
+    # and the same totals parsed in one piece
+    assert apt.analyze_logs([path], workers=1).summary() == s
@@ -0,0 +1,7 @@
+def test_noise_widens_the_threshold_at_most_twofold(apt):
+    baseline = {"steady": [1.0, 1.0, 1.01], "jittery": [1.0, 1.8, 2.0], "old": 1.0}
+    results = {"steady": [1.15, 1.15, 1.16], "jittery": [1.25, 1.9, 2.1], "old": [1.05, 1.1, 1.2]}
+    regressions, allowed = apt.compare_benchmarks(results, baseline, 0.10)
+    assert allowed["steady"] < 0.12
+    assert allowed["jittery"] == 0.20
+    assert regressions == ["steady", "jittery"]
@@ -0,0 +1,74 @@
+import random
+from collections import Counter
+
+import pytest
+
+
+def play_random(apt, b, rng, steps):
+    # random builds and move-ins (including invalid ones), checking the
+    # running totals and vacancy index against a full recount every step
+    for _ in range(steps):
+        if rng.random() < 0.5 or not b.total_floors():
+            b.add_floor(rng.choice(apt.APT_TYPES))
+        elif rng.random() < 0.5:
+            b.assign_tenant(rng.choice(apt.TENANT_POOL), rng.randint(0, b.total_floors() + 1))
+        else:
+            apt_type = rng.choice(apt.APT_TYPES)
+            fl = b.vacant_floor(apt_type)
+            if fl is not None:
+                assert b.floors[fl - 1].apt_type == apt_type
+                assert b.floors[fl - 1].tenant is None
+                b.assign_tenant(rng.choice(apt.TENANT_POOL), fl)
+        b.check_totals()
+        empty = Counter(f.apt_type for f in b.floors if f.tenant is None)
+        assert all(b.vacancies_of(t) == empty[t] for t in apt.APT_TYPES)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_totals_on_list(apt, quiet_building, seed):
+    b = quiet_building(10 ** 6, max_floors=150)
+    play_random(apt, b, random.Random(seed), 600)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_totals_on_floor_store(apt, quiet_building, seed):
+    b = quiet_building(10 ** 6, max_floors=150, floors=apt.FloorStore())
+    play_random(apt, b, random.Random(seed), 600)
+
+
+def test_totals_on_mapped_store(apt, quiet_building, tmp_path):
+    path = str(tmp_path / "tower.flr")
+    rng = random.Random(7)
+    b = quiet_building(10 ** 6, max_floors=20_000, floors=apt.FloorStore(path))
+    for _ in range(9000):  # past the first 64 KiB block, so the mapping grows
+        b.add_floor(rng.choice(apt.APT_TYPES))
+    play_random(apt, b, rng, 40)
+    expected = b.recompute_totals()
+    b.floors.close()
+
+    reopened = quiet_building(10 ** 6, max_floors=20_000, floors=apt.FloorStore(path, "r+"))
+    assert reopened.recompute_totals() == expected
+    play_random(apt, reopened, rng, 40)
+    reopened.floors.close()
+
+
+def test_totals_after_snapshot(apt, quiet_building, tmp_path):
+    path = str(tmp_path / "save.bin")
+    rng = random.Random(3)
+    for height in (50, apt.SMALL_TOWER + 100):  # Apartment list, then FloorStore
+        b = quiet_building(10 ** 6, max_floors=height + 200)
+        for _ in range(height):
+            b.add_floor(rng.choice(apt.APT_TYPES))
+        play_random(apt, b, rng, 40)
+        apt.save_snapshot(b, path, rng=random.Random())
+        loaded = apt.load_snapshot(path, rng=random.Random())
+        loaded.verbose = False
+        loaded.check_totals()
+        play_random(apt, loaded, rng, 40)
+
+
+def test_pool_tenants_are_read_only(apt):
+    t = apt.TENANT_POOL[0]
+    with pytest.raises(AttributeError):
+        t.preference = apt.APT_TYPES[-1]
+    assert t.preference == apt.TENANTS[0][1]
@@ -0,0 +1,64 @@
+# Forecaster projections against actually taking the offer and settling
+# the rest of the year with Building.fast_forward
+import copy
+import random
+
+import pytest
+
+
+def random_tower(apt, make, rules, rng):
+    b = make(10 ** 6, rules=rules)
+    for _ in range(rng.randint(0, rules.max_floors - 1)):
+        b.add_floor(rng.choice(apt.APT_TYPES))
+        if rng.random() < 0.7:
+            fl = rng.randint(1, b.total_floors())
+            if b.floors[fl - 1].tenant is None:
+                b.assign_tenant(rng.choice(apt.TENANT_POOL), fl)
+    b.week = rng.randint(1, apt.TOTAL_WEEKS)
+    return b
+
+
+def year_end(b, *moves, to_week=None):
+    # capital at to_week (default: year end) after the given moves
+    c = copy.deepcopy(b)
+    for move in moves:
+        move(c)
+    if to_week is None:
+        c.fast_forward(log=False)
+    else:
+        c.fast_forward(to_week, log=False)
+    return c.capital
+
+
+@pytest.mark.parametrize("custom", [False, True])
+def test_forecasts_match_fast_forward(apt, quiet_building, custom):
+    rules = apt.Rules(pref_bonus=0.3, height_rate=0.7, maint_div=11, ground_maint=5) if custom \
+        else apt.DEFAULT_RULES
+    wanderer = next(t for t in apt.TENANT_POOL if t.preference is None)
+    rng = random.Random(20)
+    for _ in range(150):
+        b = random_tower(apt, quiet_building, rules, rng)
+        t = rng.choice(apt.APT_TYPES)
+
+        def build(c):
+            c.add_floor(t)
+
+        def lease_top(c):
+            c.assign_tenant(wanderer, c.total_floors())
+
+        empty, leased, payback = apt.Forecaster.build_option(b, t)
+        assert empty == year_end(b, build)
+        assert leased == year_end(b, build, lease_top)
+        if payback:
+            # building is ahead of not building from the payback week, not before
+            assert year_end(b, build, lease_top, to_week=payback) >= year_end(b, to_week=payback)
+            if payback > b.week:
+                assert (year_end(b, build, lease_top, to_week=payback - 1)
+                        < year_end(b, to_week=payback - 1))
+
+        tenant = rng.choice(apt.TENANT_POOL)
+        fl, rent, end = apt.Forecaster.lease_option(b, tenant)
+        if fl is None:
+            assert end == year_end(b)
+        else:
+            assert end == year_end(b, lambda c: c.assign_tenant(tenant, fl))
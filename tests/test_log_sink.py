@@ -0,0 +1,56 @@
+import gzip
+import os
+
+import pytest
+
+
+def lines(n, start=0):
+    return "".join(f"week {i:04d} {'x' * 30}\n" for i in range(start, start + n))
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_rotates_past_max_bytes(apt, tmp_path, compress):
+    path = str(tmp_path / "game_log.txt")
+    sink = apt.LogSink(path, max_bytes=400, backups=2, flush_interval=60, compress=compress)
+    chunks = [lines(8, 8 * k) for k in range(5)]  # 328 bytes each: one file per chunk
+    for chunk in chunks:
+        sink.write(chunk)
+        sink.flush()
+    sink.close()
+
+    def read(name):
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(name, "rt", encoding="utf-8") as f:
+            return f.read()
+
+    ext = ".gz" if compress else ""
+    assert read(path) == chunks[4]
+    assert read(f"{path}.1{ext}") == chunks[3]
+    assert read(f"{path}.2{ext}") == chunks[2]
+    assert not os.path.exists(f"{path}.3{ext}")  # older ones dropped
+
+
+def test_no_rotation_below_max_bytes(apt, tmp_path):
+    path = str(tmp_path / "game_log.txt")
+    sink = apt.LogSink(path, max_bytes=10_000, flush_interval=60)
+    for k in range(5):
+        sink.write(lines(8, 8 * k))
+        sink.flush()
+    sink.close()
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == lines(40)
+    assert not os.path.exists(path + ".1.gz")
+
+
+def test_failed_flush_keeps_text(apt, tmp_path):
+    folder = tmp_path / "logs"  # missing until later: the first flush fails
+    path = str(folder / "game_log.txt")
+    sink = apt.LogSink(path, flush_interval=60)
+    sink.write("first\n")
+    with pytest.raises(OSError):
+        sink.flush()
+    sink.write("second\n")
+    folder.mkdir()
+    sink.close()
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "first\nsecond\n"
@@ -0,0 +1,57 @@
+# The event-driven Portfolio against a naive loop that plays every tower
+# every week and settles the pool from all towers' nets each week
+import pytest
+
+
+def naive(apt, towers, strategy, years, capital, seed):
+    pf = apt.Portfolio(towers, strategy, years, capital, seed)  # only for its fresh towers
+    cap = pf.start_capital
+    done = [False] * towers  # full and fully let after its strategy stopped
+    ends = []
+    for _ in range(years):
+        active = [not d for d in done]
+        for wk in range(1, apt.TOTAL_WEEKS + 1):
+            for i, sim in enumerate(pf.sims):
+                if not active[i]:
+                    continue
+                b = sim.building
+                b.week, b.capital = wk, cap
+                playing = sim.play_week()
+                cap = b.capital
+                if not playing:
+                    active[i] = False
+                    done[i] = not (b.total_floors() < b.max_floors or b.vacancies())
+            cap += sum(s.building.weekly_income() - s.building.weekly_maintenance() for s in pf.sims)
+        ends.append(cap)
+        if cap <= apt.BANKRUPT_LIMIT:
+            cap = pf.start_capital
+    return ends, cap
+
+
+@pytest.mark.parametrize("args", [
+    (30, "build-then-lease", 3, None, 1),
+    (25, "cheapest", 4, 2000, 2),
+    (20, "pref-lease", 3, 100, 3),
+    (10, "random", 2, 50, 4),
+    (40, "build-then-lease", 5, 60, 5),
+])
+def test_matches_naive_loop(apt, args):
+    pf = apt.Portfolio(*args)
+    pf.run()
+    ends, cap = naive(apt, *args)
+    assert pf.year_end_capital == ends
+    assert pf.capital == cap
+
+
+def test_idle_towers_are_skipped(apt):
+    # towers that stop early get no events for the rest of the year
+    pf = apt.Portfolio(30, "build-then-lease", 3, None, 1)
+    pf.run()
+    assert pf.events < pf.summary()["tower_weeks"] // 2
+
+
+def test_bankruptcy_resets_pool(apt):
+    pf = apt.Portfolio(10, "random", 3, 50, 4)
+    pf.run()
+    assert pf.resets > 0
+    assert pf.resets == sum(1 for c in pf.year_end_capital if c <= apt.BANKRUPT_LIMIT)
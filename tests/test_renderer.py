@@ -0,0 +1,134 @@
+import io
+import random
+import re
+from contextlib import redirect_stdout
+
+import pytest
+
+
+def old_draw(b, width=22, indent=4, quiet=False):
+    # Building.draw() as it was before TowerRenderer, kept as the reference
+    IND = " " * indent
+    inner = width - 2
+
+    top_border  = IND + "┌" + "─" * (width - 2) + "┐"
+    mid_border  = IND + "├" + "─" * (width - 2) + "┤"
+
+    # ground same width as building
+    ground_line = IND + "▒" * width
+
+    def block(a="", b=""):
+        print(IND + "|" + a.center(inner) + "|")
+        print(IND + "|" + b.center(inner) + "|")
+    if not quiet:
+        print(f"\n========== Week {b.week} ==========")
+    print(top_border)
+
+    for apt in reversed(b.floors):
+        room = apt.apt_type
+        tenant_name = apt.tenant.name if apt.tenant else "---"
+        tenant_display = f"Tenant: {tenant_name}"
+        block(room, tenant_display)
+        print(mid_border)
+
+    block("GROUND FLOOR", f'<< {b.tower_name} >>')
+    print(ground_line)
+    if not quiet:
+        total = len(b.floors)
+        empty = sum(1 for apt in b.floors if apt.tenant is None)
+        print(f"\n{IND}🏢 Units: {total}  |  Empty: {empty}/{total}")
+        print(f"{IND}💰 Capital: {b.capital}\n")
+
+
+def captured(fn, *args, **kwargs):
+    out = io.StringIO()
+    with redirect_stdout(out):
+        fn(*args, **kwargs)
+    return out.getvalue()
+
+
+def drawn(b, **kwargs):
+    out = io.StringIO()
+    b.draw(out=out, **kwargs)
+    return out.getvalue()
+
+
+def grow(apt, b, rng, floors):
+    for _ in range(floors):
+        b.add_floor(rng.choice(apt.APT_TYPES))
+        if rng.random() < 0.5:
+            b.assign_tenant(rng.choice(apt.TENANT_POOL), rng.randint(1, b.total_floors()))
+
+
+@pytest.mark.parametrize("quiet", [False, True])
+@pytest.mark.parametrize("layout", [{}, {"width": 30, "indent": 2}])
+def test_matches_old_draw(apt, quiet_building, quiet, layout):
+    rng = random.Random(6)
+    b = quiet_building(10 ** 6)
+    b.tower_name = "Old Town"
+    for _ in range(12):  # the cached rows must follow every change
+        assert drawn(b, quiet=quiet, **layout) == captured(old_draw, b, quiet=quiet, **layout)
+        grow(apt, b, rng, 8)
+        b.week += 1
+
+
+def diff_writes(text):
+    # {row: line} rewritten by one diff-mode frame
+    return {int(row): line for row, line in re.findall(r"\x1b\[(\d+);1H\x1b\[2K([^\x1b]*)", text)}
+
+
+def test_diff_rewrites_only_changes(apt, quiet_building):
+    rng = random.Random(1)
+    b = quiet_building(10 ** 6)
+    grow(apt, b, rng, 5)
+    while not b.vacancies():
+        b.add_floor(apt.APT_TYPES[0])
+    b.renderer = apt.TowerRenderer(diff=True, rows=60)
+    full = apt.TowerRenderer().frame(b)
+
+    first = drawn(b)
+    assert first.startswith("\x1b[r\x1b[2J\x1b[H" + "\n".join(full))
+    assert first.endswith(f"\x1b[{len(full) + 1};60r\x1b[{len(full) + 1};1H")
+    assert drawn(b) == "\x1b7\x1b8"  # nothing changed
+    assert drawn(b, quiet=True) == "\x1b7\x1b8"  # pinned: the quiet view is the same frame
+
+    fl = next(i + 1 for i, a in enumerate(b.floors) if a.tenant is None)
+    b.assign_tenant(apt.TENANT_POOL[0], fl)
+    now = apt.TowerRenderer().frame(b)
+    changed = {i + 1: line for i, line in enumerate(now) if line != full[i]}
+    assert len(changed) == 2  # the floor's tenant row and the vacancy footer
+    assert diff_writes(drawn(b)) == changed
+
+    b.add_floor(apt.APT_TYPES[1])  # taller frame: pinned again from the top
+    assert drawn(b).startswith("\x1b[r\x1b[2J\x1b[H")
+
+
+def test_diff_falls_back_when_too_tall(apt, quiet_building):
+    b = quiet_building(10 ** 6)
+    grow(apt, b, random.Random(2), 30)
+    b.renderer = apt.TowerRenderer(diff=True, rows=40)
+    assert drawn(b) == "\n".join(apt.TowerRenderer().frame(b)) + "\n"
+
+
+def test_lease_view_finds_low_vacancy(apt, quiet_building):
+    n = apt.MAX_FLOORS + 20
+    b = quiet_building(10 ** 9, max_floors=n)
+    b.draw_window = apt.SANDBOX_WINDOW
+    for _ in range(n):
+        b.add_floor("Zen Chamber")
+    for fl in range(1, n + 1):
+        if fl != 5:
+            b.assign_tenant(apt.TENANT_POOL[0], fl)
+
+    out = io.StringIO()
+    b.draw_for_lease(apt.TENANT_POOL[1], out=out)
+    text = out.getvalue()
+    assert text.count("Tenant: ---") == 1
+    assert f"Showing floors 1-{apt.SANDBOX_WINDOW} of {n}" in text
+    assert "Empty floors: 5" in text
+
+    b.assign_tenant(apt.TENANT_POOL[1], 5)
+    out = io.StringIO()
+    b.draw_for_lease(apt.TENANT_POOL[1], out=out)
+    assert f"Showing floors {n - apt.SANDBOX_WINDOW + 1}-{n} of {n}" in out.getvalue()
+    assert "Empty floors" not in out.getvalue()
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+
+class Player:
+    # scripted replies: random menu picks, one quit at a week boundary, two years
+    def __init__(self, seed, quit_after):
+        self.rng = random.Random(seed)
+        self.quit_after = quit_after
+        self.weeks = 0
+        self.years = 0
+
+    def __call__(self, prompt):
+        if prompt.startswith("Start game"):
+            return "y"
+        if prompt.startswith("Name"):
+            return "Replay Tower"
+        if prompt.startswith("View weekly log"):
+            self.weeks += 1
+            return "q" if self.weeks == self.quit_after else self.rng.choice("nny")
+        if "Start a new apartment building" in prompt:
+            self.years += 1
+            return "y" if self.years == 1 else "n"
+        if prompt.startswith("Select floor"):
+            top = int(prompt.split("-")[1].split(")")[0])
+            return str(self.rng.randint(0, top + 1))  # sometimes out of range
+        return self.rng.choice(["1", "1", "2", "2", "2", "3", "0", "x"])
+
+
+def drive(steps, record, player):
+    # run_prompts() with the player in place of input()
+    prompt = next(steps)
+    try:
+        while True:
+            reply = player(prompt)
+            record.replies.append(reply)
+            prompt = steps.send(reply)
+    except StopIteration as done:
+        return done.value
+
+
+def test_resumed_session_replays_exactly(apt, tmp_path):
+    save = str(tmp_path / "save.bin")
+    player = Player(11, quit_after=20)
+
+    rec = apt.GameRecord(seed=5)
+    rng = random.Random(rec.seed)
+    with pytest.raises(SystemExit):
+        drive(apt.game_steps(autosave=save, rng=rng, record=rec, log_sink=apt.SessionLog(None)),
+              rec, player)
+    assert rec.replies[-1] == "q" and not rec.years
+
+    # what __main__ does for --resume
+    resumed_rec = apt.GameRecord()
+    rng = random.Random(resumed_rec.seed)
+    b = apt.load_snapshot(save, rng, resumed_rec)
+    assert b.week == 20 and resumed_rec.seed == rec.seed
+    drive(apt.game_steps(resume=b, autosave=save, rng=rng, record=resumed_rec,
+                         auto_lease=resumed_rec.auto_lease, max_floors=resumed_rec.max_floors,
+                         log_sink=apt.SessionLog(None)),
+          resumed_rec, player)
+    assert player.years == 2
+    assert [len(y["income_history"]) for y in resumed_rec.years] == [apt.TOTAL_WEEKS] * 2
+    assert all(len(set(y["income_history"])) > 1 for y in resumed_rec.years)
+
+    got = apt.replay_record(resumed_rec)
+    assert apt.first_difference(resumed_rec, got) is None
+    assert got.years == resumed_rec.years
+
+    # and the check does notice a replay that went elsewhere
+    other = apt.GameRecord().load(resumed_rec.to_dict())
+    other.seed += 1
+    assert apt.first_difference(resumed_rec, apt.replay_record(other)) is not None
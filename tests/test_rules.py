@@ -0,0 +1,28 @@
+import pytest
+
+
+def test_whole_floats_become_ints(apt, quiet_building):
+    rules = apt.Rules.from_dict({"ground_maint": 20.0, "maint_div": 15.0, "pref_bonus": 0,
+                                 "build_cost": {"Zen Chamber": 100.0}})
+    assert type(rules.ground_maint) is int and type(rules.maint_div) is int
+    assert type(rules.pref_bonus) is float
+    assert type(rules.build_cost["Zen Chamber"]) is int
+    assert apt.Rules.from_dict({"ground_maint": 20.0}).is_default()
+
+    b = quiet_building(rules=rules)
+    b.add_floor("Zen Chamber")
+    b.fast_forward(log=False)
+    assert all(type(c) is int for c in b.income_history)
+
+
+@pytest.mark.parametrize("d", [
+    {"ground_maint": 20.5},
+    {"maint_div": "15"},
+    {"actions_per_week": True},
+    {"max_floors": float("inf")},
+    {"rent_rate": None},
+    {"build_cost": {"Zen Chamber": 99.5}},
+])
+def test_bad_values_rejected(apt, d):
+    with pytest.raises(ValueError):
+        apt.Rules.from_dict(d)
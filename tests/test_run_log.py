@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+
+class NullSink:
+    def write(self, text):
+        pass
+
+
+def logged_year(apt, path, fmt, name, seed):
+    # one simulated year written to a RunLog opened (appending) just for it
+    run_log = apt.RunLog(path, fmt)
+    sim = apt.Simulation(apt.PrefLeasePolicy(), rng=random.Random(seed), tower_name=name, log=True)
+    sim.building.log_sink = NullSink()
+    sim.building.run_log = run_log
+    sim.run()
+    run_log.close()
+    return sim.building
+
+
+@pytest.mark.parametrize("fmt", ["bin", "jsonl"])
+def test_two_runs_round_trip(apt, tmp_path, fmt):
+    path = str(tmp_path / f"runs.{fmt}")
+    towers = [logged_year(apt, path, fmt, "North", 1), logged_year(apt, path, fmt, "Süd", 2)]
+
+    reader = apt.RunLogReader(path)
+    runs = reader.runs()
+    assert [r["name"] for r in runs] == ["North", "Süd"]
+    assert runs[0]["offset"] == 0 < runs[1]["offset"]
+    assert all(r["format"] == fmt for r in runs)
+
+    for run, b in zip(runs, towers):
+        assert run["start_capital"] == b.start_capital
+        weeks = list(reader.weeks(run))
+        assert [w["week"] for w in weeks] == list(range(1, apt.TOTAL_WEEKS + 1))
+        assert [w["capital"] for w in weeks] == b.income_history
+        previous = b.start_capital
+        for w in weeks:
+            spent = sum(r["cost"] for r in w["builds"])
+            assert w["income"] - w["maint"] == w["net"] == w["capital"] - previous + spent
+            assert w["builds"] == b.build_log.get(w["week"], [])
+            assert w["moveins"] == b.movein_log.get(w["week"], [])
+            previous = w["capital"]
+
+
+@pytest.mark.parametrize("fmt", ["bin", "jsonl"])
+def test_resumed_year_opens_a_run(apt, tmp_path, fmt):
+    path = str(tmp_path / f"runs.{fmt}")
+    logged_year(apt, path, fmt, "North", 1)
+
+    # a game resumed after week 20 writes its first week record at 21
+    run_log = apt.RunLog(path, fmt)
+    sim = apt.Simulation(apt.PrefLeasePolicy(), rng=random.Random(5), tower_name="Resumed", log=True)
+    sim.building.week = 21
+    sim.building.log_sink = NullSink()
+    sim.building.run_log = run_log
+    sim.run()
+    run_log.close()
+
+    reader = apt.RunLogReader(path)
+    runs = reader.runs()
+    assert [r["name"] for r in runs] == ["North", "Resumed"]
+    assert len(list(reader.weeks(runs[0]))) == apt.TOTAL_WEEKS
+    assert [w["week"] for w in reader.weeks(runs[1])] == list(range(21, apt.TOTAL_WEEKS + 1))
@@ -0,0 +1,30 @@
+import random
+
+
+def test_years_carry_capital_over(apt):
+    finals = apt.simulate_years(apt.BuildThenLeasePolicy(), 4, seed=1)
+    rng = random.Random(1)
+    capital = apt.STARTING_CAPITAL
+    for final in finals:
+        sim = apt.Simulation(apt.BuildThenLeasePolicy(), capital, rng=rng)
+        assert sim.run() == final
+        capital = final
+    assert finals[-1] > finals[0] > apt.STARTING_CAPITAL
+
+
+def test_bankrupt_year_resets_capital(apt):
+    rules = apt.Rules(starting_capital=300)
+    finals = apt.simulate_years(apt.RandomPolicy(), 6, seed=4, rules=rules)
+    assert any(c <= apt.BANKRUPT_LIMIT for c in finals)
+    rng = random.Random(4)
+    capital = 300
+    for final in finals:
+        sim = apt.Simulation(apt.RandomPolicy(), capital, rng=rng, rules=rules)
+        assert sim.run() == final
+        capital = rules.starting_capital if final <= apt.BANKRUPT_LIMIT else final
+
+
+def test_simulation_is_reproducible(apt):
+    a = apt.simulate_year(apt.PrefLeasePolicy(), seed=9)
+    b = apt.simulate_year(apt.PrefLeasePolicy(), seed=9)
+    assert a == b
@@ -0,0 +1,44 @@
+import random
+
+
+def filled_tower(make, floors, **kwargs):
+    b = make(10**9, **kwargs)
+    for _ in range(floors):
+        assert b.add_floor("Forest Cabin")
+    return b
+
+
+def test_no_build_above_the_tower_limit(apt, quiet_building):
+    b = filled_tower(quiet_building, 50, max_floors=50)
+    solver = apt.Solver(depth=1).for_building(b)
+    assert solver.max_floors == 50
+    assert "1" not in solver.action_values(apt.solver_state(b, 0))
+
+    tall = filled_tower(quiet_building, apt.MAX_FLOORS, max_floors=300)
+    assert "1" in apt.Solver(depth=1).for_building(tall).action_values(apt.solver_state(tall, 0))
+
+
+def test_end_now_value_uses_the_rules(apt, quiet_building):
+    rules = apt.Rules(ground_maint=55, maint_div=5, actions_per_week=3)
+    b = filled_tower(quiet_building, 4, rules=rules)
+    b.week = 40
+    values = apt.Solver(depth=1, rules=rules).action_values(apt.solver_state(b, 0))
+    net = b.weekly_income() - b.weekly_maintenance()
+    assert values["4"] == (apt.TOTAL_WEEKS - 40 + 1) * net
+
+
+def test_for_building_keeps_a_matching_solver(apt, quiet_building):
+    solver = apt.Solver(depth=1)
+    assert solver.for_building(quiet_building()) is solver
+    assert solver.for_building(quiet_building(rules=apt.Rules())) is solver
+    other = solver.for_building(quiet_building(rules=apt.Rules(ground_maint=40)))
+    assert other is not solver and other.ground == 40
+
+
+def test_solver_policy_under_custom_rules(apt):
+    rules = apt.Rules(actions_per_week=3, cost_scale=1.5, ground_maint=30)
+    sim = apt.Simulation(apt.SolverPolicy(apt.Solver(depth=1)), rng=random.Random(3), rules=rules)
+    sim.run()
+    assert sim.policy.solver.rules is rules
+    assert sim.building.total_floors() > 0
+    sim.building.check_totals()
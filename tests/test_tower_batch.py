@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+CUSTOM = dict(pref_bonus=0.25, cost_scale=0.8, maint_div=9, maint_add=2,
+              height_rate=2.3, ground_maint=7, rent_rate=0.7)
+
+
+def random_towers(apt, make, rules, count, seed):
+    rng = random.Random(seed)
+    towers = []
+    for _ in range(count):
+        b = make(rules=rules)
+        for _ in range(rng.randrange(60)):
+            if rng.random() < 0.6:
+                b.add_floor(rng.choice(apt.APT_TYPES))
+            elif b.total_floors():
+                b.assign_tenant(rng.choice(apt.TENANT_POOL), rng.randint(1, b.total_floors()))
+        towers.append(b)
+    return towers
+
+
+@pytest.mark.parametrize("custom", [False, True])
+def test_settle_matches_building(apt, quiet_building, custom):
+    rules = apt.Rules(**CUSTOM) if custom else apt.DEFAULT_RULES
+    towers = random_towers(apt, quiet_building, rules, 50, seed=1)
+    batch = apt.TowerBatch.from_buildings(towers)
+    for _ in range(5):
+        income, maint, net = batch.settle_week()
+        expected = [b.settle_week() for b in towers]
+        assert [tuple(int(x) for x in row) for row in zip(income, maint, net)] == expected
+        assert batch.capital.tolist() == [b.capital for b in towers]
+
+
+@pytest.mark.parametrize("custom", [False, True])
+def test_batch_updates_match_building(apt, quiet_building, custom):
+    rules = apt.Rules(**CUSTOM) if custom else apt.DEFAULT_RULES
+    rng = random.Random(2)
+    count = 40
+    towers = [quiet_building(rules=rules) for _ in range(count)]
+    batch = apt.TowerBatch(count, rules=rules)
+    everyone = list(range(count))
+    for _ in range(80):
+        if rng.random() < 0.5:
+            types = [rng.randrange(len(apt.APT_TYPES)) for _ in everyone]
+            ok = batch.add_floors(everyone, types)
+            built = [b.add_floor(apt.APT_TYPES[t]) for b, t in zip(towers, types)]
+        else:
+            floors = [rng.randint(0, b.total_floors() + 1) for b in towers]
+            tenants = [rng.choice(apt.TENANT_POOL) for _ in everyone]
+            ok = batch.assign_tenants(everyone, floors, [t.pref_id for t in tenants])
+            built = [b.assign_tenant(t, f) for b, t, f in zip(towers, tenants, floors)]
+        assert ok.tolist() == built
+        assert batch.weekly_income().tolist() == [b.weekly_income() for b in towers]
+        assert batch.weekly_maintenance().tolist() == [b.weekly_maintenance() for b in towers]
+        assert batch.capital.tolist() == [b.capital for b in towers]
+
+
+def test_mixed_rules_rejected(apt, quiet_building):
+    towers = [quiet_building(), quiet_building(rules=apt.Rules(**CUSTOM))]
+    with pytest.raises(ValueError):
+        apt.TowerBatch.from_buildings(towers)
+
+
+def test_duplicate_floor_rejected(apt):
+    batch = apt.TowerBatch(3)
+    batch.add_floors([0, 1], [0, 0])
+    with pytest.raises(ValueError):
+        batch.assign_tenants([0, 1, 0], [1, 1, 1], [2, 3, 4])
+    assert not batch.occupied.any()
+    assert batch.assign_tenants([0, 1, 0], [1, 1, 2], [2, 3, 4]).tolist() == [True, True, False]